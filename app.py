@@ -1,43 +1,120 @@
 import streamlit as st
-import pandas as pd
-from openai import OpenAI
 from dotenv import load_dotenv
+import importlib
 import os
 
-# Import components
-from components.premium_vs_free import show_premium_vs_free_tab
-from components.geography import show_geography_tab
-from components.chat_analysis import show_chat_analysis_tab
-from components.usage_patterns import show_usage_patterns_tab
-from components.core_metrics import show_core_metrics_tab
-from components.prediction import show_prediction_tab
+# Import components. The tab modules (and plotly, sklearn and openai behind
+# them) are imported when their section is first shown; see render_section
+from components.data_loader import load_dataset, format_memory_report
+from components.aggregates import get_aggregate_cube, group_size, overall_stat
+from components.segments import show_segment_filter
+from components.sampling import exact_refinement, get_preview_sample, is_preview, stratified_mean
+from components.instrumentation import begin_run, end_run, show_debug_panel, start_metrics_server, traced
+from components.warmup import WARMUP, start_warmup
 # Import other components...
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI client, created (and openai imported) the first time the chat is opened
+@st.cache_resource
+def get_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# "lazy" renders only the selected section; "tabs" keeps the classic st.tabs
+# layout, where every tab runs on each interaction
+TAB_MODE = os.getenv("HIGHNOTE_TAB_MODE", "lazy")
+
+# Path of a row-grouped Parquet file (or "1" for the default export) to stream
+# instead of loading the data into memory; see components/out_of_core.py
+OUT_OF_CORE = os.getenv("HIGHNOTE_OUT_OF_CORE")
+
+# HIGHNOTE_DEBUG=1 adds the performance panel (span timings, cache hit rates,
+# exports, profiling); HIGHNOTE_METRICS_PORT serves Prometheus metrics
+DEBUG = os.getenv("HIGHNOTE_DEBUG") == "1"
+METRICS_PORT = os.getenv("HIGHNOTE_METRICS_PORT")
 
 # Page config
 st.set_page_config(page_title="High Note User Analysis", layout="wide")
 
-# Load data
-@st.cache_data
+if METRICS_PORT:
+    start_metrics_server(int(METRICS_PORT))
+# Spans of this run; "Profile the next rerun" in the panel captures it with cProfile
+run = begin_run(profile=DEBUG and st.session_state.pop("perf_profile_next", False))
+
+def finish_run():
+    # Every way out of the script ends the run, so the profiler is not left
+    # enabled and the run's spans reach the debug panel
+    run = end_run()
+    if DEBUG:
+        show_debug_panel(run)
+
+# Load data. cache_resource hands every session the same frame: its columns
+# are read-only views of the memory-mapped Arrow cache, so sessions share one
+# copy instead of each unpickling its own
+@st.cache_resource
+@traced
 def load_data():
-    df = pd.read_excel("High Note data.xlsx")
-    dict_df = pd.read_excel("High Note data dictionary.xlsx")
+    if OUT_OF_CORE:
+        from components.out_of_core import open_out_of_core
+        return open_out_of_core(None if OUT_OF_CORE == "1" else OUT_OF_CORE)
+    # Parses the workbooks once into a memory-mapped Arrow cache (see data_loader)
+    df, dict_df = load_dataset("High Note data.xlsx", "High Note data dictionary.xlsx")
     return df, dict_df
 
 df, dict_df = load_data()
 
+# Optional warm-up (HIGHNOTE_WARMUP=1): every tab's caches and default figures
+# are built in background threads, once per process
+if WARMUP:
+    start_warmup(df)
+
+# Global segment filter: every section below sees only the selected users
+segment_df = show_segment_filter(df)
+
+# Approximate preview: the tabs read a cached stratified sample instead of the
+# selected rows; the exact aggregates can be computed in the background and
+# replace the preview once they are cached
+view_df = segment_df
+refinement = None
+if st.sidebar.toggle("Fast approximate preview", key="approximate"):
+    if st.sidebar.checkbox("Refine to exact results in the background", value=True, key="refine_exact"):
+        refinement = exact_refinement(segment_df)
+    if refinement is None or not refinement.done():
+        view_df = get_preview_sample(segment_df)
+
+@st.fragment(run_every=2)
+def wait_for_exact(job):
+    if job.done():
+        st.rerun()
+    st.caption("⏳ Computing exact results in the background...")
+
 # Main title and metrics
 st.title("🎵 High Note User Analysis Dashboard")
 
+if segment_df.empty:
+    st.warning("No users match the selected segment.")
+    finish_run()
+    st.stop()
+
+if is_preview(view_df):
+    st.info(f"Preview from a stratified sample of {len(view_df):,} of "
+            f"{view_df.attrs['preview']['population']:,} users; figures are estimates (± 95% CI).")
+    if refinement is not None:
+        wait_for_exact(refinement)
+
 # Top metrics
-total_users = len(df)
-premium_users = len(df[df['adopter'] == 1])
+cube = get_aggregate_cube(view_df)
+total_users = int(group_size(cube, 'all').iloc[0])
+premium_users = int(group_size(cube, 'adopter').get(1, 0))
 premium_rate = (premium_users / total_users) * 100
+avg_tenure = overall_stat(cube, 'mean', 'tenure')
+premium_rate_ci = tenure_ci = 0.0
+if is_preview(view_df):
+    premium_rate, premium_rate_ci = stratified_mean(view_df, 'adopter')
+    premium_rate, premium_rate_ci = premium_rate * 100, premium_rate_ci * 100
+    avg_tenure, tenure_ci = stratified_mean(view_df, 'tenure')
 
 col1, col2, col3, col4 = st.columns(4)
 with col1:
@@ -45,34 +122,44 @@ with col1:
 with col2:
     st.metric("Premium Users", f"{premium_users:,}")
 with col3:
-    st.metric("Premium Conversion Rate", f"{premium_rate:.1f}%")
+    st.metric("Premium Conversion Rate",
+              f"{premium_rate:.1f}%" + (f" ± {premium_rate_ci:.1f}" if premium_rate_ci else ""))
 with col4:
-    avg_tenure = df['tenure'].mean()
-    st.metric("Average User Tenure", f"{avg_tenure:.1f} months")
-
-# Create tabs
-tabs = st.tabs(["🎯 Premium vs Free Users", "🌍 User Geography", "📊 Usage Patterns", 
-                "🔍 Core Metrics Analysis (B-M)", "🤖 Prediction Model", "💬 Analysis Chat"])
-
-# Show content for each tab
-with tabs[0]:
-    show_premium_vs_free_tab(df)
-    
-with tabs[1]:
-    show_geography_tab(df)
-    
-with tabs[2]:
-    show_usage_patterns_tab(df)
-    
-with tabs[3]:
-    show_core_metrics_tab(df, dict_df)
-    
-with tabs[4]:
-    show_prediction_tab(df)
-    
-with tabs[5]:
-    show_chat_analysis_tab(df, dict_df, client)
+    st.metric("Average User Tenure",
+              f"{avg_tenure:.1f}" + (f" ± {tenure_ci:.1f}" if tenure_ci else "") + " months")
+
+def render_section(module, function, *args):
+    # Imports the tab's module on first use: a session that never opens the
+    # prediction or chat section never loads sklearn or openai
+    getattr(importlib.import_module(f"components.{module}"), function)(*args)
+
+# Sections of the dashboard. The prediction model is always trained on all
+# users, so filtering does not retrain it per segment (the chat's model tool
+# uses it too), and the chat assistant always answers from exact figures.
+sections = {
+    "🎯 Premium vs Free Users": lambda: render_section("premium_vs_free", "show_premium_vs_free_tab", view_df),
+    "🌍 User Geography": lambda: render_section("geography", "show_geography_tab", view_df),
+    "📊 Usage Patterns": lambda: render_section("usage_patterns", "show_usage_patterns_tab", view_df),
+    "🔍 Core Metrics Analysis (B-M)": lambda: render_section("core_metrics", "show_core_metrics_tab", view_df, dict_df),
+    "🤖 Prediction Model": lambda: render_section("prediction", "show_prediction_tab", df),
+    "💬 Analysis Chat": lambda: render_section("chat_analysis", "show_chat_analysis_tab", segment_df, dict_df, get_client(), df),
+}
+
+if TAB_MODE == "tabs":
+    # Show content for each tab
+    for tab, show_section in zip(st.tabs(list(sections)), sections.values()):
+        with tab:
+            show_section()
+else:
+    # Only the selected section runs; widgets inside a section rerun their own
+    # fragment rather than the whole script
+    active_section = st.radio("Section", list(sections), horizontal=True,
+                              label_visibility="collapsed", key="active_section")
+    sections[active_section]()
 
 # Data Dictionary
 with st.expander("📚 Data Dictionary"):
-    st.dataframe(dict_df[['Variable', 'Description', 'Notes']])
\ No newline at end of file
+    st.dataframe(dict_df[['Variable', 'Description', 'Notes']])
+    st.caption(format_memory_report(df))
+
+finish_run()
\ No newline at end of file
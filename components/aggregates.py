@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import streamlit as st
+
+from components.data_loader import data_fingerprint, is_out_of_core, read_cached_frame, write_atomic
+from components.instrumentation import tracked_cache
+
+# Columns every tab slices by
+SEGMENT_KEYS = ['adopter', 'good_country', 'male']
+
+# Quantiles stored per group; 0.5 doubles as the median
+QUANTILES = {0.25: 'q25', 0.5: 'median', 0.75: 'q75'}
+
+SIZE_COLUMN = ('__size__', 'size')
+
+# Per-row sampling weight (population rows represented), set on preview samples
+WEIGHT_COLUMN = '_weight'
+
+
+def numeric_columns(df):
+    # Underscore-prefixed columns are internal helpers (e.g. sample weights)
+    return [c for c in df.select_dtypes(include='number').columns if not str(c).startswith('_')]
+
+
+def _group_stats(df, keys, columns):
+    grouped = df.groupby(keys, observed=True, sort=True)[columns]
+
+    stats = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    quantiles = grouped.quantile(list(QUANTILES)).unstack(level=-1)
+    quantiles.columns = pd.MultiIndex.from_tuples(
+        [(column, QUANTILES[q]) for column, q in quantiles.columns]
+    )
+
+    return assemble_group_table(stats, quantiles, grouped.size())
+
+
+def weighted_quantiles(values, weights, probabilities):
+    # Interpolates between weighted midpoints of the sorted values
+    present = ~np.isnan(values)
+    values, weights = values[present], weights[present]
+    if len(values) == 0:
+        return np.full(len(probabilities), np.nan)
+    order = np.argsort(values, kind='stable')
+    values, weights = values[order], weights[order]
+    midpoints = (np.cumsum(weights) - weights / 2) / weights.sum()
+    return np.interp(probabilities, midpoints, values)
+
+
+def _weighted_group_stats(df, keys, columns, weights):
+    # Population estimates from a weighted sample: counts and sizes are sums of
+    # weights, moments and quantiles are weighted
+    labels = df[keys] if isinstance(keys, str) else keys
+    values = df[columns].astype(np.float64)
+    weights = pd.Series(np.asarray(weights, dtype=np.float64), index=df.index)
+
+    present_weight = values.notna().mul(weights, axis=0).groupby(labels, sort=True).sum()
+    mean = values.mul(weights, axis=0).groupby(labels, sort=True).sum() / present_weight
+    row_means = mean.reindex(labels).to_numpy()
+    squared = np.square(values - row_means).mul(weights, axis=0).groupby(labels, sort=True).sum()
+    std = np.sqrt(squared / (present_weight - 1)).where(present_weight > 1)
+
+    grouped = values.groupby(labels, sort=True)
+    stats = pd.concat({
+        'count': present_weight.round().astype(np.int64),
+        'mean': mean,
+        'std': std,
+        'min': grouped.min(),
+        'max': grouped.max(),
+    }, axis=1).swaplevel(axis=1)
+
+    array, weight_array = values.to_numpy(), weights.to_numpy()
+    table = np.full((len(mean.index), len(columns), len(QUANTILES)), np.nan)
+    for group, rows in grouped.indices.items():
+        position = mean.index.get_loc(group)
+        for i in range(len(columns)):
+            table[position, i] = weighted_quantiles(array[rows, i], weight_array[rows], list(QUANTILES))
+    quantiles = pd.DataFrame(
+        table.reshape(len(mean.index), -1), index=mean.index,
+        columns=pd.MultiIndex.from_tuples([(column, name) for column in columns for name in QUANTILES.values()]))
+
+    sizes = weights.groupby(labels, sort=True).sum().round().astype(np.int64)
+    return assemble_group_table(stats, quantiles, sizes)
+
+
+def assemble_group_table(stats, quantiles, sizes):
+    # Cube layout shared with the streaming builder in out_of_core: (column, stat)
+    # columns grouped per metric, then the group sizes
+    sizes = sizes.to_frame()
+    sizes.columns = pd.MultiIndex.from_tuples([SIZE_COLUMN])
+
+    table = pd.concat([stats, quantiles], axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    return pd.concat([table, sizes], axis=1)
+
+
+def build_aggregate_cube(df, segment_keys=SEGMENT_KEYS):
+    # One groupby per segment key covering every numeric column at once, instead
+    # of filtering the frame per metric and per group in each tab
+    columns = numeric_columns(df)
+    if WEIGHT_COLUMN in df.columns:
+        group_stats = lambda keys: _weighted_group_stats(df, keys, columns, df[WEIGHT_COLUMN])
+    else:
+        group_stats = lambda keys: _group_stats(df, keys, columns)
+    cube = {'all': group_stats(np.zeros(len(df), dtype=np.int8)).set_axis(['all'])}
+    for key in segment_keys:
+        if key in df.columns:
+            cube[key] = group_stats(key)
+    return cube
+
+
+def published_cube_dir(df):
+    # Cubes of whole datasets loaded from the shared Arrow cache are published
+    # next to it, so other processes (and restarts) map them instead of
+    # recomputing; segments and preview samples stay in the process cache
+    if 'shared' not in df.attrs or {'segment', 'preview'} & set(df.attrs):
+        return None
+    return os.path.join(os.path.dirname(df.attrs['shared']), 'aggregates', data_fingerprint(df))
+
+
+def publish_cube(cube, directory):
+    os.makedirs(directory, exist_ok=True)
+    # 'all' is written last: its presence marks a complete cube
+    for by in sorted(cube, key=lambda by: by == 'all'):
+        table = pa.Table.from_pandas(cube[by], preserve_index=True)
+        write_atomic(os.path.join(directory, f'{by}.arrow'),
+                     lambda tmp, table=table: feather.write_feather(table, tmp, compression='uncompressed'))
+
+
+def read_published_cube(directory, keys):
+    paths = {by: os.path.join(directory, f'{by}.arrow') for by in ['all', *keys]}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {by: read_cached_frame(path) for by, path in paths.items()}
+
+
+@tracked_cache('aggregate_cube', st.cache_resource(show_spinner=False))
+def _cached_cube(fingerprint, _df):
+    # cache_resource keyed on the fingerprint: the frame itself is never hashed
+    # or pickled, and the cube is shared read-only across sessions
+    directory = published_cube_dir(_df)
+    if directory is None:
+        return build_aggregate_cube(_df)
+    cube = read_published_cube(directory, [key for key in SEGMENT_KEYS if key in _df.columns])
+    if cube is None:
+        cube = build_aggregate_cube(_df)
+        publish_cube(cube, directory)
+    return cube
+
+
+def get_aggregate_cube(df):
+    if is_out_of_core(df):
+        from components.out_of_core import streamed_aggregate_cube
+        return streamed_aggregate_cube(df)
+    return _cached_cube(data_fingerprint(df), df)
+
+
+def group_stat(cube, by, stat, columns=None):
+    # Rows are the group values of `by`, columns are metrics
+    table = cube[by].drop(columns=SIZE_COLUMN[0], level=0).xs(stat, axis=1, level=1)
+    return table if columns is None else table[columns]
+
+
+def segment_stat(cube, by, value, stat, columns=None):
+    table = group_stat(cube, by, stat, columns)
+    if value not in table.index:
+        return pd.Series(np.nan, index=table.columns)
+    return table.loc[value]
+
+
+def group_size(cube, by):
+    return cube[by][SIZE_COLUMN]
+
+
+def overall_stat(cube, stat, column):
+    return cube['all'].loc['all', (column, stat)]
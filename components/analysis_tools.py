@@ -0,0 +1,178 @@
+import json
+import time
+
+import numpy as np
+import streamlit as st
+
+from components.aggregates import SEGMENT_KEYS, get_aggregate_cube, group_size, group_stat, numeric_columns
+from components.chat_context import round_sig
+from components.correlations import get_correlation_engine
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.instrumentation import tracked_cache
+
+# Local analysis functions the chat assistant calls through OpenAI function
+# calling, so the prompt only carries the statistics a question needs
+
+GROUP_STATS = ['count', 'mean', 'std', 'min', 'q25', 'median', 'q75', 'max']
+
+
+def _rounded(values):
+    return {str(key): round_sig(value) for key, value in values.items()}
+
+
+def _check_columns(df, columns):
+    unknown = [c for c in columns if c not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+
+def group_aggregates(df, by='adopter', columns=None, stats=None):
+    if by not in SEGMENT_KEYS:
+        raise ValueError(f"'by' must be one of {SEGMENT_KEYS}")
+    columns = columns or ['songsListened', 'friend_cnt', 'subscriber_friend_cnt', 'lovedTracks']
+    stats = stats or ['mean', 'median']
+    _check_columns(df, columns)
+
+    cube = get_aggregate_cube(df)
+    result = {'by': by, 'group_sizes': _rounded(group_size(cube, by)), 'groups': {}}
+    for stat in stats:
+        if stat not in GROUP_STATS:
+            raise ValueError(f"Unsupported stat {stat}; use {GROUP_STATS}")
+        table = group_stat(cube, by, stat, columns)
+        for group, row in table.iterrows():
+            result['groups'].setdefault(str(group), {})[stat] = _rounded(row)
+    return result
+
+
+def correlations(df, column='adopter', method='pearson', top_k=10, columns=None):
+    _check_columns(df, [column] + (columns or []))
+    values = get_correlation_engine(df).column(column, method, columns, df=df).dropna()
+    values = values.reindex(values.abs().sort_values(ascending=False).index)[:top_k]
+    # Out of core only Pearson is streamed; Spearman ranks the uniform sample
+    extra = {'sample_rows': len(df)} if method == 'spearman' and is_out_of_core(df) else {}
+    return {'column': column, 'method': method, 'correlations': _rounded(values), **extra}
+
+
+def quantiles(df, column, probabilities=None, by=None):
+    probabilities = probabilities or [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+    _check_columns(df, [column])
+    # Out of core, df is a uniform sample of the file; say so in the result
+    extra = {'sample_rows': len(df)} if is_out_of_core(df) else {}
+    if by is None:
+        values = df[column].quantile(probabilities)
+        return {'column': column, 'quantiles': _rounded(values), **extra}
+    if by not in SEGMENT_KEYS:
+        raise ValueError(f"'by' must be one of {SEGMENT_KEYS}")
+    table = df.groupby(by, observed=True)[column].quantile(probabilities).unstack()
+    return {'column': column, 'by': by,
+            'quantiles': {str(group): _rounded(row) for group, row in table.iterrows()}, **extra}
+
+
+def feature_importances(df):
+    # Imported lazily: only questions about the model load or train it
+    from components.model_store import get_model_artifact
+    artifact = get_model_artifact(df)
+    importances = sorted(artifact['feature_importances'].items(), key=lambda item: -item[1])
+    return {'model': artifact.get('model_name'),
+            'metrics': _rounded(artifact['metrics']),
+            'feature_importances': {name: round_sig(value) for name, value in importances}}
+
+
+TOOL_FUNCTIONS = {
+    'group_aggregates': group_aggregates,
+    'correlations': correlations,
+    'quantiles': quantiles,
+    'feature_importances': feature_importances,
+}
+
+# Tools answered from the model trained on all users, whatever the segment:
+# looking the model up with a filtered frame would train one per segment
+MODEL_TOOLS = {'feature_importances'}
+
+_SEGMENT_SCHEMA = {'type': 'string', 'enum': SEGMENT_KEYS}
+_COLUMNS_SCHEMA = {'type': 'array', 'items': {'type': 'string'}}
+
+TOOLS = [
+    {'type': 'function', 'function': {
+        'name': 'group_aggregates',
+        'description': "Statistics of numeric columns per group of a segment column "
+                       "(adopter = premium vs free, good_country = US/UK/DE vs rest, male).",
+        'parameters': {'type': 'object', 'properties': {
+            'by': _SEGMENT_SCHEMA,
+            'columns': _COLUMNS_SCHEMA,
+            'stats': {'type': 'array', 'items': {'type': 'string', 'enum': GROUP_STATS}},
+        }, 'required': ['by', 'columns']},
+    }},
+    {'type': 'function', 'function': {
+        'name': 'correlations',
+        'description': "Strongest correlations of every numeric column with one column (default adopter).",
+        'parameters': {'type': 'object', 'properties': {
+            'column': {'type': 'string'},
+            'method': {'type': 'string', 'enum': ['pearson', 'spearman']},
+            'top_k': {'type': 'integer', 'minimum': 1, 'maximum': 40},
+        }, 'required': ['column']},
+    }},
+    {'type': 'function', 'function': {
+        'name': 'quantiles',
+        'description': "Quantiles of a numeric column, optionally per group of a segment column.",
+        'parameters': {'type': 'object', 'properties': {
+            'column': {'type': 'string'},
+            'probabilities': {'type': 'array', 'items': {'type': 'number', 'minimum': 0, 'maximum': 1}},
+            'by': _SEGMENT_SCHEMA,
+        }, 'required': ['column']},
+    }},
+    {'type': 'function', 'function': {
+        'name': 'feature_importances',
+        'description': "Feature importances and holdout metrics of the premium prediction model.",
+        'parameters': {'type': 'object', 'properties': {}},
+    }},
+]
+
+
+@tracked_cache('analysis_tool', st.cache_data(show_spinner=False, max_entries=512))
+def _cached_tool(fingerprint, name, arguments_json, _df):
+    return json.dumps(TOOL_FUNCTIONS[name](_df, **json.loads(arguments_json)))
+
+
+def run_tool(df, name, arguments, model_df=None):
+    # Returns a JSON string for a tool message; errors are reported to the model
+    # rather than raised, so it can correct its call. `model_df` is the frame
+    # the prediction model is trained on (default: df)
+    if name not in TOOL_FUNCTIONS:
+        return json.dumps({'error': f"Unknown tool {name}"})
+    if name in MODEL_TOOLS and model_df is not None:
+        df = model_df
+    try:
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments or '{}')
+        return _cached_tool(data_fingerprint(df), name, json.dumps(arguments, sort_keys=True), df)
+    except (TypeError, ValueError, KeyError) as e:
+        return json.dumps({'error': str(e)})
+
+
+def benchmark_tools(df, repeats=5):
+    # Times every tool on `df` directly (no LLM, no cache), e.g.
+    #   python -m components.analysis_tools
+    calls = [
+        ('group_aggregates', {'by': 'adopter', 'columns': numeric_columns(df), 'stats': GROUP_STATS}),
+        ('correlations', {'column': 'adopter', 'method': 'pearson'}),
+        ('correlations', {'column': 'adopter', 'method': 'spearman'}),
+        ('quantiles', {'column': 'songsListened', 'by': 'adopter'}),
+        ('feature_importances', {}),
+    ]
+    timings = {}
+    for name, arguments in calls:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            TOOL_FUNCTIONS[name](df, **arguments)
+            samples.append(time.perf_counter() - start)
+        label = name + (f"[{arguments['method']}]" if 'method' in arguments else '')
+        timings[label] = {'median_ms': float(np.median(samples) * 1000), 'max_ms': float(np.max(samples) * 1000)}
+    return timings
+
+
+if __name__ == '__main__':
+    from components.data_loader import load_dataset
+    for label, timing in benchmark_tools(load_dataset()[0]).items():
+        print(f"{label:32s} median {timing['median_ms']:8.2f} ms   max {timing['max_ms']:8.2f} ms")
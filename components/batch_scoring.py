@@ -0,0 +1,175 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from components.data_loader import CACHE_DIR, CHUNK_ROWS, cache_paths, iter_chunks, load_dataset
+from components.model_store import load_artifact, load_or_train
+
+ID_COLUMN = 'net_user'
+
+# Scores are ranked through a fixed-size histogram so ranking never needs all
+# scores in memory: ranks are approximate, users within 1/RANK_BINS of each
+# other share a rank, and rows keep their input order (score_frame ranks
+# exactly and sorts)
+RANK_BINS = 1 << 16
+RANK_NOTE = (f"Approximate: users whose propensities fall in the same 1/{RANK_BINS} bin share a rank; "
+             "rows are in input order, not sorted by rank")
+
+_worker_model = None
+
+
+def _init_worker(artifact):
+    # Each worker receives the artifact once (pickled by the pool, so it need
+    # not be in the model registry) and scores single-threaded, so the pool
+    # rather than the forest provides the parallelism
+    global _worker_model
+    if 'n_jobs' in artifact['model'].get_params():
+        artifact['model'].set_params(n_jobs=1)
+    _worker_model = artifact
+
+
+def _score_array(X, artifact):
+    X_scaled = artifact['scaler'].transform(X)
+    return artifact['model'].predict_proba(X_scaled)[:, 1]
+
+
+def _score_in_worker(X):
+    return _score_array(X, _worker_model)
+
+
+def _prepare_chunk(chunk, features, only_free):
+    if only_free and 'adopter' in chunk.columns:
+        chunk = chunk[chunk['adopter'] == 0]
+    if ID_COLUMN in chunk.columns:
+        ids = chunk[ID_COLUMN].astype(str).to_numpy()
+    else:
+        ids = chunk.index.astype(str).to_numpy()
+    return ids, chunk[features]
+
+
+def _scored_chunks(source, artifact, features, only_free, workers, chunk_rows):
+    columns = None
+    if isinstance(source, str) and not source.lower().endswith('.csv'):
+        schema_names = (pq.read_schema(source).names if source.lower().endswith('.parquet')
+                        else feather.read_table(source, memory_map=True).column_names)
+        columns = [c for c in [ID_COLUMN, 'adopter', *features] if c in schema_names]
+
+    def prepared_chunks():
+        for chunk in iter_chunks(source, columns=columns, chunk_rows=chunk_rows):
+            ids, X = _prepare_chunk(chunk, features, only_free)
+            # With only_free, a chunk of adopters only is empty; sklearn
+            # rejects arrays without rows
+            if len(X):
+                yield ids, X
+
+    chunks = prepared_chunks()
+
+    if workers <= 1:
+        for ids, X in chunks:
+            yield ids, _score_array(X, artifact)
+        return
+
+    # Keep at most two chunks per worker in flight so memory stays bounded
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(artifact,)) as pool:
+        pending = []
+        for ids, X in chunks:
+            pending.append((ids, pool.submit(_score_in_worker, X)))
+            if len(pending) >= 2 * workers:
+                ids, future = pending.pop(0)
+                yield ids, future.result()
+        for ids, future in pending:
+            yield ids, future.result()
+
+
+def score_file(source, output, artifact, only_free=False, workers=None, chunk_rows=CHUNK_ROWS):
+    # Score `source` in chunks and write (id, propensity, rank, percentile) to
+    # Parquet. Two streaming passes: score + histogram, then attach ranks.
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    features = artifact['features']
+
+    histogram = np.zeros(RANK_BINS, dtype=np.int64)
+    schema = pa.schema([(ID_COLUMN, pa.string()), ('propensity', pa.float64())])
+    output_dir = os.path.dirname(os.path.abspath(output))
+
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        scores_path = os.path.join(tmp_dir, 'scores.parquet')
+        with pq.ParquetWriter(scores_path, schema) as writer:
+            for ids, scores in _scored_chunks(source, artifact, features, only_free, workers, chunk_rows):
+                histogram += np.bincount(_score_bins(scores), minlength=RANK_BINS)
+                writer.write_table(pa.table({ID_COLUMN: ids, 'propensity': scores}, schema=schema))
+
+        total = int(histogram.sum())
+        # Number of users scoring in a strictly higher bin than each bin
+        above = np.concatenate([np.cumsum(histogram[::-1])[::-1][1:], [0]])
+
+        note = {'description': RANK_NOTE}
+        ranked_schema = schema.append(pa.field('propensity_rank', pa.int64(), metadata=note)) \
+                              .append(pa.field('propensity_percentile', pa.float64(), metadata=note))
+        with pq.ParquetWriter(output, ranked_schema) as writer:
+            for batch in pq.ParquetFile(scores_path).iter_batches(batch_size=chunk_rows):
+                bins = _score_bins(batch.column('propensity').to_numpy())
+                rows_above = above[bins]
+                writer.write_table(pa.table({
+                    ID_COLUMN: batch.column(ID_COLUMN),
+                    'propensity': batch.column('propensity'),
+                    'propensity_rank': rows_above + 1,
+                    'propensity_percentile': 100.0 * (total - rows_above) / max(total, 1),
+                }, schema=ranked_schema))
+
+    return {'rows': total, 'output': output, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def _score_bins(scores):
+    return np.clip((np.asarray(scores) * RANK_BINS).astype(np.int64), 0, RANK_BINS - 1)
+
+
+def score_frame(df, artifact, only_free=False):
+    # In-memory API for frames that fit in RAM: returns scores sorted by rank
+    ids, X = _prepare_chunk(df, artifact['features'], only_free)
+    scores = _score_array(X, artifact) if len(X) else np.empty(0)
+    result = pd.DataFrame({ID_COLUMN: ids, 'propensity': scores})
+    result = result.sort_values('propensity', ascending=False, kind='stable').reset_index(drop=True)
+    result['propensity_rank'] = result['propensity'].rank(ascending=False, method='min').astype(np.int64)
+    result['propensity_percentile'] = 100.0 * result['propensity'].rank(method='max') / max(len(result), 1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score High Note users with the premium propensity model.",
+                                     epilog=f"propensity_rank and propensity_percentile: {RANK_NOTE}.")
+    parser.add_argument('input', nargs='?', help="CSV, Parquet or Arrow file (default: the cached user table)")
+    parser.add_argument('-o', '--output', default='propensity_scores.parquet')
+    parser.add_argument('--model', help="Model registry key (default: the prediction tab's model)")
+    parser.add_argument('--free-only', action='store_true', help="Only score users with adopter == 0")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    if args.model:
+        artifact = load_artifact(args.model)
+        if artifact is None:
+            parser.error(f"No model {args.model} in the registry")
+        artifact['key'] = args.model
+    else:
+        artifact = load_or_train(load_dataset()[0])
+
+    source = args.input
+    if source is None:
+        source = cache_paths(CACHE_DIR)['data']
+
+    summary = score_file(source, args.output, artifact, only_free=args.free_only,
+                         workers=args.workers, chunk_rows=args.chunk_rows)
+    print(f"Scored {summary['rows']:,} users in {summary['seconds']}s -> {summary['output']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.subplots import make_subplots
+
+from components.data_loader import data_fingerprint
+from components.distributions import get_distribution_summary
+from components.instrumentation import tracked_cache
+
+USER_TYPE_COLORS = {0: '#4ECDC4', 1: '#FF6B6B'}
+
+
+def _group_color(color_map, group):
+    return color_map.get(group, '#888888')
+
+
+def _box_trace(box, group, color, orientation, show_legend=False):
+    position = [str(group)]
+    trace = go.Box(
+        q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+        lowerfence=[box['lowerfence']], upperfence=[box['upperfence']],
+        mean=[box['mean']],
+        name=str(group), legendgroup=str(group), showlegend=show_legend,
+        marker_color=color, boxpoints=False, orientation=orientation,
+    )
+    if orientation == 'h':
+        trace.update(y=position)
+    else:
+        trace.update(x=position)
+    return trace
+
+
+def _outlier_trace(box, group, color, orientation):
+    outliers = box['outliers']
+    position = [str(group)] * len(outliers)
+    x, y = (outliers, position) if orientation == 'h' else (position, outliers)
+    return go.Scatter(
+        x=x, y=y, mode='markers', marker=dict(color=color, size=4),
+        name=str(group), legendgroup=str(group), showlegend=False,
+        hovertemplate='%{' + ('x' if orientation == 'h' else 'y') + '}<extra></extra>',
+    )
+
+
+def _histogram(df, column, title, color_map, by):
+    # Same layout as px.histogram(..., color=by, marginal="box"), but built from
+    # pre-binned counts and box statistics so the payload does not grow with rows
+    summary = get_distribution_summary(df, column, by=by)
+    edges, centers, log = summary['edges'], summary['centers'], summary['log']
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                        row_heights=[0.26, 0.74], vertical_spacing=0.02)
+    for group, data in summary['groups'].items():
+        color = _group_color(color_map, group)
+        fig.add_trace(go.Bar(
+            x=centers, y=data['counts'],
+            width=None if log else np.diff(edges),
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate=f'{column}=[%{{customdata[0]:.4g}}, %{{customdata[1]:.4g}})<br>count=%{{y}}<extra></extra>',
+            name=str(group), legendgroup=str(group), marker_color=color,
+        ), row=2, col=1)
+
+        box = data['box']
+        if box is None:
+            continue
+        if log:
+            # Log axes cannot show zero; pin zero-valued stats to the zero bin
+            box = {**box, **{k: max(box[k], centers[0]) for k in ('q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean')}}
+        fig.add_trace(_box_trace(box, group, color, 'h'), row=1, col=1)
+        if len(box['outliers']):
+            fig.add_trace(_outlier_trace(box, group, color, 'h'), row=1, col=1)
+
+    fig.update_layout(title=title, barmode='relative', bargap=0, legend_title_text=by)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_yaxes(title_text='count', row=2, col=1)
+    fig.update_xaxes(title_text=column + (' (log bins)' if log else ''), row=2, col=1)
+    if log:
+        fig.update_xaxes(type='log')
+    return fig
+
+
+def _box(df, column, title, color_map, by):
+    # Equivalent of px.box(df, x=by, y=column, color=by) from precomputed quartiles,
+    # whiskers and a capped outlier sample
+    summary = get_distribution_summary(df, column, by=by)
+
+    fig = go.Figure()
+    for group, data in summary['groups'].items():
+        box = data['box']
+        if box is None:
+            continue
+        color = _group_color(color_map, group)
+        fig.add_trace(_box_trace(box, group, color, 'v', show_legend=True))
+        if len(box['outliers']):
+            fig.add_trace(_outlier_trace(box, group, color, 'v'))
+
+    fig.update_layout(title=title, legend_title_text=by,
+                      xaxis_title=by, yaxis_title=column)
+    return fig
+
+
+def _violin(df, column, title, color_map, by):
+    # Equivalent of px.violin(df, x=by, y=column, color=by, box=True) drawn from
+    # the server-side KDE: one mirrored density outline plus a thin inner box
+    summary = get_distribution_summary(df, column, by=by)
+    groups = [(group, data) for group, data in summary['groups'].items() if data['kde'] is not None]
+
+    fig = go.Figure()
+    for position, (group, data) in enumerate(groups):
+        color = _group_color(color_map, group)
+        kde = data['kde']
+        half_width = 0.4 * kde['density'] / kde['density'].max() if kde['density'].max() > 0 else kde['density']
+
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([position - half_width, (position + half_width)[::-1]]),
+            y=np.concatenate([kde['x'], kde['x'][::-1]]),
+            fill='toself', mode='lines', line=dict(color=color, width=1),
+            name=str(group), legendgroup=str(group), hoverinfo='skip',
+        ))
+
+        box = data['box']
+        fig.add_trace(go.Box(
+            x=[position], q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+            lowerfence=[box['lowerfence']], upperfence=[box['upperfence']],
+            width=0.08, marker_color=color, boxpoints=False,
+            name=str(group), legendgroup=str(group), showlegend=False,
+        ))
+
+    fig.update_layout(title=title, legend_title_text=by, yaxis_title=column,
+                      xaxis=dict(title=by, tickvals=list(range(len(groups))),
+                                 ticktext=[str(group) for group, _ in groups]))
+    return fig
+
+
+FIGURE_BUILDERS = {'histogram': _histogram, 'box': _box, 'violin': _violin}
+
+
+@tracked_cache('figure', st.cache_resource(show_spinner=False, max_entries=256))
+def _cached_figure(kind, fingerprint, column, title, colors, by, _df):
+    # Built once per dataset version and shared between sessions (and filled
+    # ahead of time by components.warmup); callers only hand it to plotly_chart
+    return FIGURE_BUILDERS[kind](_df, column, title, dict(colors), by)
+
+
+def histogram_figure(df, column, title, color_map=USER_TYPE_COLORS, by='adopter'):
+    return _cached_figure('histogram', data_fingerprint(df), column, title, tuple(color_map.items()), by, df)
+
+
+def box_figure(df, column, title, color_map=USER_TYPE_COLORS, by='adopter'):
+    return _cached_figure('box', data_fingerprint(df), column, title, tuple(color_map.items()), by, df)
+
+
+def violin_figure(df, column, title, color_map=USER_TYPE_COLORS, by='adopter'):
+    return _cached_figure('violin', data_fingerprint(df), column, title, tuple(color_map.items()), by, df)
@@ -1,25 +1,173 @@
 import streamlit as st
 import pandas as pd
+import os
 import time
+from components.analysis_tools import TOOLS, run_tool
+from components.chat_context import get_numeric_data_context, render_tool_context
+from components.data_loader import data_fingerprint
+from components.instrumentation import traced, traced_stream
+from components.response_cache import get_response_cache, response_key
 
-def get_numeric_data_context(df):
-    # Get only numeric columns
-    numeric_df = df.select_dtypes(include=['int64', 'float64'])
-    
-    # Create a JSON-like string with key statistics and sample data
-    data_stats = {
-        'numerical_stats': numeric_df.describe().to_dict(),
-        'correlations': numeric_df.corr()['adopter'].to_dict(),
-        'sample_data': numeric_df.head(5).to_dict('records'),
-        'column_info': {col: {
-            'dtype': str(numeric_df[col].dtype),
-            'unique_values': len(numeric_df[col].unique()),
-            'missing_values': numeric_df[col].isnull().sum()
-        } for col in numeric_df.columns}
-    }
-    return data_stats
-
-def show_chat_analysis_tab(df, dict_df, client):
+# Chat completion settings; OPENAI_BASE_URL (read by the OpenAI client) can point
+# these calls at any OpenAI-compatible server, e.g. tools/fake_openai_server.py
+CHAT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+CHAT_TEMPERATURE = 0.7
+CHAT_MAX_TOKENS = 1000
+# Rounds of tool calls before the model must answer from what it has
+MAX_TOOL_ROUNDS = 4
+
+def build_messages(context, prompt):
+    return [
+        {"role": "system", "content": f"""You are a data analysis assistant for High Note, a music streaming service. 
+        You have access to detailed user data and statistics through the provided tools.
+        Call them for any figure you need (group aggregates, correlations, quantiles,
+        model feature importances) instead of guessing.
+        
+        Context about the data:
+        {context}
+        
+        Your role is to:
+        1. Provide data-driven insights and recommendations
+        2. Use specific numbers and statistics from the data
+        3. Identify actionable patterns and trends
+        4. Suggest concrete steps for improvement
+        5. Focus on practical, implementable solutions
+        
+        Format your responses with:
+        - Clear sections
+        - Bullet points for key findings
+        - Specific metrics when relevant
+        - Actionable recommendations
+        
+        Always maintain a professional, analytical tone."""},
+        {"role": "user", "content": prompt}
+    ]
+
+def prepare_request(df, prompt, model_df=None):
+    # Only headline numbers go into the prompt; detailed statistics are fetched
+    # through tool calls, so the context is the same for every question. The
+    # cache key covers the data the tools answer from, not just the headlines
+    context = render_tool_context(get_numeric_data_context(df))
+    data_key = f"{data_fingerprint(df)}:{data_fingerprint(model_df if model_df is not None else df)}"
+    key = response_key(prompt, data_key, CHAT_MODEL, CHAT_TEMPERATURE)
+    return build_messages(context, prompt), key
+
+def _completion_args(messages, final_round):
+    args = dict(model=CHAT_MODEL, messages=messages, temperature=CHAT_TEMPERATURE,
+                max_tokens=CHAT_MAX_TOKENS, stream=True, tools=TOOLS)
+    if final_round:
+        args["tool_choice"] = "none"
+    return args
+
+def _accumulate_tool_calls(tool_calls, delta):
+    # Streamed tool calls arrive as fragments keyed by index; the id and name
+    # come once, the JSON arguments piece by piece
+    for fragment in delta.tool_calls or []:
+        call = tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+        if fragment.id:
+            call["id"] = fragment.id
+        if fragment.function and fragment.function.name:
+            call["name"] += fragment.function.name
+        if fragment.function and fragment.function.arguments:
+            call["arguments"] += fragment.function.arguments
+
+def _append_tool_results(messages, df, content, tool_calls, model_df=None):
+    calls = [tool_calls[index] for index in sorted(tool_calls)]
+    messages.append({
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {"id": call["id"], "type": "function",
+             "function": {"name": call["name"], "arguments": call["arguments"]}}
+            for call in calls
+        ],
+    })
+    for call in calls:
+        messages.append({"role": "tool", "tool_call_id": call["id"],
+                         "content": run_tool(df, call["name"], call["arguments"], model_df)})
+
+class ToolCallLoop:
+    # The conversation shared by the sync and async clients: rounds() yields
+    # the arguments of each completion request, feed() takes the streamed
+    # chunks of its response, and the model's tool calls are run locally
+    # between rounds. Only the API calls differ between the two clients.
+
+    def __init__(self, df, messages, model_df=None):
+        self.df = df
+        self.messages = messages
+        self.model_df = model_df
+        self.parts = []
+        self.round_parts, self.tool_calls = [], {}
+
+    def rounds(self):
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            self.round_parts, self.tool_calls = [], {}
+            yield _completion_args(self.messages, round_index == MAX_TOOL_ROUNDS)
+            self.parts.extend(self.round_parts)
+            if not self.tool_calls:
+                return
+            _append_tool_results(self.messages, self.df, ''.join(self.round_parts), self.tool_calls, self.model_df)
+
+    def feed(self, chunk):
+        # Returns the text to show, if the chunk carries any
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        _accumulate_tool_calls(self.tool_calls, delta)
+        if delta.content:
+            self.round_parts.append(delta.content)
+        return delta.content
+
+    def answer(self):
+        return ''.join(self.parts)
+
+def stream_analysis_response(client, df, prompt, cache=None, model_df=None):
+    # Yields the answer as it is generated, running the model's tool calls
+    # locally between rounds; repeated questions on the same data are served
+    # from the response cache without calling the API. Model questions are
+    # answered from the model trained on `model_df` (default: df)
+    cache = cache or get_response_cache()
+    messages, key = prepare_request(df, prompt, model_df)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        loop = ToolCallLoop(df, messages, model_df)
+        for args in loop.rounds():
+            for chunk in client.chat.completions.create(**args):
+                if text := loop.feed(chunk):
+                    yield text
+        # An empty answer (nothing streamed) is not worth replaying
+        if loop.answer().strip():
+            cache.set(key, loop.answer())
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+async def astream_analysis_response(async_client, df, prompt, cache=None, model_df=None):
+    # Same as stream_analysis_response for an AsyncOpenAI client
+    cache = cache or get_response_cache()
+    messages, key = prepare_request(df, prompt, model_df)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        loop = ToolCallLoop(df, messages, model_df)
+        for args in loop.rounds():
+            async for chunk in await async_client.chat.completions.create(**args):
+                if text := loop.feed(chunk):
+                    yield text
+        # An empty answer (nothing streamed) is not worth replaying
+        if loop.answer().strip():
+            cache.set(key, loop.answer())
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+@traced
+def show_chat_analysis_tab(df, dict_df, client, model_df=None):
     st.header("Chat with High Note Analysis Assistant")
     
     # Initialize chat history and processed suggestions in session state
@@ -39,68 +187,7 @@ def show_chat_analysis_tab(df, dict_df, client):
 
     # Function to generate analysis insights
     def generate_analysis_response(prompt):
-        # Get data context
-        data_context = get_numeric_data_context(df)
-        
-        total_users = len(df)
-        premium_users = len(df[df['adopter'] == 1])
-        premium_rate = (premium_users / total_users) * 100
-        avg_tenure = df['tenure'].mean()
-        
-        # Create a context string with key metrics and data insights
-        context = f"""
-        Key metrics about High Note:
-        - Total Users: {total_users:,}
-        - Premium Users: {premium_users:,}
-        - Premium Conversion Rate: {premium_rate:.1f}%
-        - Average User Tenure: {avg_tenure:.1f} months
-        
-        Data Dictionary:
-        {dict_df[['Variable', 'Description']].to_dict('records')}
-        
-        Statistical Context:
-        1. Correlation with Premium Adoption:
-        {dict(sorted(data_context['correlations'].items(), key=lambda x: abs(x[1]), reverse=True))}
-        
-        2. Key Metrics Statistics:
-        {data_context['numerical_stats']}
-        
-        3. Sample User Data:
-        {data_context['sample_data']}
-        """
-        
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": f"""You are a data analysis assistant for High Note, a music streaming service. 
-                    You have access to detailed user data and statistics. 
-                    
-                    Context about the data:
-                    {context}
-                    
-                    Your role is to:
-                    1. Provide data-driven insights and recommendations
-                    2. Use specific numbers and statistics from the data
-                    3. Identify actionable patterns and trends
-                    4. Suggest concrete steps for improvement
-                    5. Focus on practical, implementable solutions
-                    
-                    Format your responses with:
-                    - Clear sections
-                    - Bullet points for key findings
-                    - Specific metrics when relevant
-                    - Actionable recommendations
-                    
-                    Always maintain a professional, analytical tone."""},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+        return traced_stream('generate_analysis_response', stream_analysis_response(client, df, prompt, model_df=model_df))
 
     # Chat input
     if prompt := st.chat_input("Ask about High Note's user analysis..."):
@@ -111,10 +198,8 @@ def show_chat_analysis_tab(df, dict_df, client):
             
             # Generate and display assistant response
             with st.chat_message("assistant"):
-                with st.spinner('Analyzing data and generating response...'):
-                    response = generate_analysis_response(prompt)
-                    st.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                response = st.write_stream(generate_analysis_response(prompt))
+                st.session_state.messages.append({"role": "assistant", "content": response})
 
     # Add helpful prompt suggestions
     st.markdown("### Suggested Questions:")
@@ -147,14 +232,19 @@ def show_chat_analysis_tab(df, dict_df, client):
                     
                     # Generate and display assistant response
                     with st.chat_message("assistant"):
-                        with st.spinner('Analyzing data and generating response...'):
-                            response = generate_analysis_response(suggestion)
-                            st.markdown(response)
-                            st.session_state.messages.append({"role": "assistant", "content": response})
+                        response = st.write_stream(generate_analysis_response(suggestion))
+                        st.session_state.messages.append({"role": "assistant", "content": response})
                 st.session_state.processed_suggestions.add(suggestion)
 
+    cache_stats = get_response_cache().stats()
+    st.caption(f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+
     # Add clear chat button at the bottom
     if st.button("🗑️ Clear Chat History", key="clear_chat"):
         st.session_state.messages = []
         st.session_state.processed_suggestions = set()
-        st.rerun() 
\ No newline at end of file
+        st.rerun()
+
+def warm_up(df):
+    # The data context every question is answered from (see components/warmup.py)
+    get_numeric_data_context(df)
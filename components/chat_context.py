@@ -0,0 +1,111 @@
+import json
+import math
+import os
+
+import streamlit as st
+
+from components.aggregates import (get_aggregate_cube, group_size, numeric_columns, overall_stat,
+                                   published_cube_dir, segment_stat)
+from components.data_loader import CACHE_DIR, data_fingerprint, write_atomic
+from components.instrumentation import tracked_cache
+
+CONTEXT_DIR = os.path.join(CACHE_DIR, 'context')
+
+
+def round_sig(value, digits=3):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = float(value)
+    if value == 0:
+        return 0
+    if math.isinf(value):
+        return value
+    rounded = round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+    return int(rounded) if rounded == int(rounded) and abs(rounded) < 1e15 else rounded
+
+
+def build_numeric_context(df):
+    # Headline numbers and per-column statistics for the prompt, from the
+    # shared aggregate cube (no describe() pass of its own); correlations are
+    # fetched through the correlations tool when a question needs them
+    cube = get_aggregate_cube(df)
+    columns = numeric_columns(df)
+
+    total_users = int(group_size(cube, 'all').iloc[0])
+    premium_users = int(group_size(cube, 'adopter').get(1, 0))
+
+    stats = {}
+    premium_means = segment_stat(cube, 'adopter', 1, 'mean')
+    free_means = segment_stat(cube, 'adopter', 0, 'mean')
+    for column in columns:
+        stats[column] = {
+            stat: round_sig(overall_stat(cube, stat, column))
+            for stat in ['mean', 'std', 'min', 'median', 'max']
+        }
+        stats[column]['premium_mean'] = round_sig(premium_means[column])
+        stats[column]['free_mean'] = round_sig(free_means[column])
+        stats[column]['missing'] = int(total_users - overall_stat(cube, 'count', column))
+
+    return {
+        'fingerprint': data_fingerprint(df),
+        'key_metrics': {
+            'total_users': total_users,
+            'premium_users': premium_users,
+            'premium_rate_pct': round_sig(100 * premium_users / max(total_users, 1)),
+            'avg_tenure_months': round_sig(overall_stat(cube, 'mean', 'tenure')),
+        },
+        'stats': stats,
+    }
+
+
+def _context_path(fingerprint):
+    return os.path.join(CONTEXT_DIR, f'{fingerprint}.json')
+
+
+def _load_or_build(fingerprint, df):
+    # Only whole datasets are kept on disk, like the published cubes: a file
+    # per segment or preview sample would pile up with every selection
+    if published_cube_dir(df) is None:
+        return build_numeric_context(df)
+    path = _context_path(fingerprint)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    context = build_numeric_context(df)
+    os.makedirs(CONTEXT_DIR, exist_ok=True)
+
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(context, f)
+    write_atomic(path, write)
+    return context
+
+
+@tracked_cache('numeric_context', st.cache_resource(show_spinner=False, max_entries=32))
+def _cached_context(fingerprint, _df):
+    return _load_or_build(fingerprint, _df)
+
+
+def get_numeric_data_context(df):
+    # Built once per dataset version: in memory per process, and for whole
+    # datasets on disk across restarts
+    return _cached_context(data_fingerprint(df), df)
+
+
+def render_tool_context(context):
+    # Minimal system prompt context for tool calling: headline numbers and the
+    # column names the tools accept; everything else is fetched on demand
+    metrics = context['key_metrics']
+    return '\n'.join([
+        "Key metrics about High Note:",
+        f"- Total Users: {metrics['total_users']:,}",
+        f"- Premium Users: {metrics['premium_users']:,}",
+        f"- Premium Conversion Rate: {metrics['premium_rate_pct']}%",
+        f"- Average User Tenure: {metrics['avg_tenure_months']} months",
+        "",
+        "Numeric columns: " + ', '.join(context['stats']),
+    ])
+
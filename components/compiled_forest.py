@@ -0,0 +1,127 @@
+import argparse
+
+import numpy as np
+
+# Rows are traversed in blocks so the (rows x trees) node matrix stays small
+PREDICT_BLOCK_ROWS = 4096
+
+
+def compile_forest(artifact, positive_class=1):
+    # Flatten every tree of the fitted RandomForest into shared node arrays.
+    # Leaves point back to themselves, so traversal is a fixed number of
+    # branch-free gather steps (the forest's maximum depth).
+    model, scaler = artifact['model'], artifact['scaler']
+    if not hasattr(model, 'estimators_') or not hasattr(model.estimators_[0], 'tree_'):
+        raise ValueError(f"Only random forests can be compiled, got {type(model).__name__}")
+    class_index = list(model.classes_).index(positive_class)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+        rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+
+        counts = tree.value[:, 0, :]
+        values.append(counts[:, class_index] / counts.sum(axis=1))
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth),
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'features': np.asarray(artifact['features']),
+    }
+
+
+def save_compiled(compiled, path):
+    np.savez(path, **compiled)
+
+
+def load_compiled(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _predict_block(compiled, X):
+    n_rows = X.shape[0]
+    rows = np.arange(n_rows)[:, None]
+    node = np.broadcast_to(compiled['roots'], (n_rows, len(compiled['roots']))).copy()
+
+    feature, threshold = compiled['feature'], compiled['threshold']
+    left, right = compiled['left'], compiled['right']
+    for depth in range(int(compiled['max_depth'])):
+        go_left = X[rows, feature[node]] <= threshold[node]
+        node = np.where(go_left, left[node], right[node])
+        # Most paths end well before the deepest leaf; stop once all have
+        if depth % 4 == 3 and (left[node] == node).all():
+            break
+
+    return compiled['value'][node].mean(axis=1)
+
+
+def predict_proba(compiled, X):
+    # Premium probability for raw (unscaled) feature rows, matching
+    # scaler.transform + RandomForestClassifier.predict_proba(...)[:, 1]
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    X = (X - compiled['scaler_mean']) / compiled['scaler_scale']
+    # sklearn evaluates splits on float32 inputs against float64 thresholds
+    X = X.astype(np.float32).astype(np.float64)
+
+    if X.shape[0] <= PREDICT_BLOCK_ROWS:
+        return _predict_block(compiled, X)
+    return np.concatenate([_predict_block(compiled, X[start:start + PREDICT_BLOCK_ROWS])
+                           for start in range(0, X.shape[0], PREDICT_BLOCK_ROWS)])
+
+
+def main(argv=None):
+    # Imported here so the evaluator itself only depends on NumPy
+    from components.data_loader import load_dataset
+    from components.model_store import DEFAULT_PARAMS, load_artifact, load_or_train
+
+    parser = argparse.ArgumentParser(description="Export the propensity forest to flat NumPy arrays.")
+    parser.add_argument('-o', '--output', default='propensity_forest.npz')
+    parser.add_argument('--model', help="Model registry key (default: the prediction tab's model)")
+    parser.add_argument('--train-forest', action='store_true',
+                        help="Train and export a random forest of its own when the tab's model is not one")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        artifact = load_artifact(args.model)
+        if artifact is None:
+            parser.error(f"No model {args.model} in the registry")
+    else:
+        # The model the prediction tab serves, so both give the same propensities
+        df = load_dataset()[0]
+        artifact = load_or_train(df)
+        if not hasattr(artifact['model'], 'estimators_') and args.train_forest:
+            print(f"Warning: the prediction tab serves {artifact.get('model_name')}; exporting a separately "
+                  "trained random forest, whose propensities differ from the tab's")
+            artifact = load_or_train(df, params=dict(DEFAULT_PARAMS, candidates=['random_forest']))
+
+    try:
+        compiled = compile_forest(artifact)
+    except ValueError as e:
+        parser.error(f"{e}. Model selection picked {artifact.get('model_name')}; pass --train-forest "
+                     "to export a separate random forest, or --model with a forest's registry key")
+    save_compiled(compiled, args.output)
+    print(f"Exported {len(compiled['roots'])} trees / {len(compiled['feature']):,} nodes -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
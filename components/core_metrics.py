@@ -1,45 +1,64 @@
 import streamlit as st
-import plotly.express as px
 import pandas as pd
+from components.aggregates import get_aggregate_cube, segment_stat
+from components.charts import box_figure, histogram_figure
+from components.instrumentation import plotly_chart, traced
+from components.sampling import group_mean_cis, is_preview
 
+CORE_METRICS = ['male', 'friend_cnt', 'avg_friend_age', 'avg_friend_male',
+                'friend_country_cnt', 'subscriber_friend_cnt', 'songsListened',
+                'lovedTracks', 'posts', 'playlists', 'shouts']
+
+@traced
 def show_core_metrics_tab(df, dict_df):
     st.header("Core Metrics Analysis")
 
     # Define core metrics
-    core_metrics = ['male', 'friend_cnt', 'avg_friend_age', 'avg_friend_male',
-                   'friend_country_cnt', 'subscriber_friend_cnt', 'songsListened',
-                   'lovedTracks', 'posts', 'playlists', 'shouts']
+    core_metrics = CORE_METRICS
 
     # Statistical Analysis
     st.subheader("📊 Statistical Overview")
 
-    # Calculate statistics
+    # Calculate statistics from the shared aggregate cube
+    cube = get_aggregate_cube(df)
+    descriptions = dict_df.drop_duplicates('Variable').set_index('Variable')['Description']
+    premium_stats = {stat: segment_stat(cube, 'adopter', 1, stat) for stat in ['mean', 'median', 'std']}
+    free_stats = {stat: segment_stat(cube, 'adopter', 0, stat) for stat in ['mean', 'median', 'std']}
+
     stats_data = []
     for metric in core_metrics:
-        premium_data = df[df['adopter'] == 1][metric]
-        free_data = df[df['adopter'] == 0][metric]
-
-        premium_stats = premium_data.agg(['mean', 'median', 'std']).round(2)
-        free_stats = free_data.agg(['mean', 'median', 'std']).round(2)
-
         stats_data.append({
             'Metric': metric,
-            'Description': dict_df[dict_df['Variable'] == metric]['Description'].iloc[0] 
-            if len(dict_df[dict_df['Variable'] == metric]['Description']) > 0 else 'No description available',
-            'Premium Mean': premium_stats['mean'],
-            'Premium Median': premium_stats['median'],
-            'Premium Std': premium_stats['std'],
-            'Free Mean': free_stats['mean'],
-            'Free Median': free_stats['median'],
-            'Free Std': free_stats['std']
+            'Description': descriptions.get(metric, 'No description available'),
+            'Premium Mean': premium_stats['mean'][metric],
+            'Premium Median': premium_stats['median'][metric],
+            'Premium Std': premium_stats['std'][metric],
+            'Free Mean': free_stats['mean'][metric],
+            'Free Median': free_stats['median'][metric],
+            'Free Std': free_stats['std'][metric]
         })
 
     stats_df = pd.DataFrame(stats_data)
+    if is_preview(df):
+        # Means are stratified estimates; the sample's medians and spreads are
+        # weighted too but come without an interval
+        cis = group_mean_cis(df, 'adopter', core_metrics)
+        stats_df.insert(stats_df.columns.get_loc('Premium Mean') + 1, 'Premium Mean ± (95% CI)',
+                        cis.get(1, pd.Series(dtype=float)).reindex(core_metrics).to_numpy())
+        stats_df.insert(stats_df.columns.get_loc('Free Mean') + 1, 'Free Mean ± (95% CI)',
+                        cis.get(0, pd.Series(dtype=float)).reindex(core_metrics).to_numpy())
+        st.caption("Estimated from the preview sample: means with their 95% CI, "
+                   "medians and standard deviations approximate.")
+    stats_df = stats_df.round(2)
     st.dataframe(stats_df, use_container_width=True)
 
     # Visualization
     st.subheader("📈 Metric Analysis")
-    
+    show_metric_analysis(df, core_metrics, stats_df)
+
+@st.fragment
+def show_metric_analysis(df, core_metrics, stats_df):
+    # Changing the metric only reruns this fragment
     selected_metric = st.selectbox(
         "Select metric to analyze",
         core_metrics,
@@ -47,18 +66,24 @@ def show_core_metrics_tab(df, dict_df):
     )
 
     col1, col2 = st.columns(2)
+    box, histogram = metric_figures(df, selected_metric)
 
     with col1:
-        fig = px.box(df, x='adopter', y=selected_metric,
-                    color='adopter',
-                    title=f"{selected_metric} by User Type",
-                    color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(box, use_container_width=True)
 
     with col2:
-        fig = px.histogram(df, x=selected_metric,
-                          color='adopter',
-                          marginal="box",
-                          title=f"{selected_metric} Distribution",
-                          color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'})
-        st.plotly_chart(fig, use_container_width=True) 
\ No newline at end of file
+        plotly_chart(histogram, use_container_width=True)
+
+def metric_figures(df, metric):
+    box = box_figure(df, metric,
+                     title=f"{metric} by User Type",
+                     color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+    histogram = histogram_figure(df, metric,
+                                 title=f"{metric} Distribution",
+                                 color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+    return box, histogram
+
+def warm_up(df):
+    # Caches behind the tab's default view (see components/warmup.py)
+    get_aggregate_cube(df)
+    metric_figures(df, CORE_METRICS[0]) 
\ No newline at end of file
@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from components.aggregates import numeric_columns
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.instrumentation import tracked_cache
+
+METHODS = ('pearson', 'spearman')
+
+
+def _sufficient_stats(values, shift):
+    # Pairwise sums over the rows where both columns are present, as matrix
+    # products: entry [i, j] only counts rows where column j is not NaN.
+    # Values are shifted by a per-column constant to keep the products well
+    # conditioned; correlations do not depend on the shift.
+    valid = ~np.isnan(values)
+    centered = np.where(valid, values - shift, 0.0)
+    mask = valid.astype(np.float64)
+    return (
+        mask.T @ mask,                      # pairwise counts
+        centered.T @ mask,                  # sum of x_i
+        np.square(centered).T @ mask,       # sum of x_i ** 2
+        centered.T @ centered,              # sum of x_i * x_j
+    )
+
+
+def _column_means(values):
+    valid = ~np.isnan(values)
+    return np.where(valid, values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+
+
+def _correlation_matrix(count, total, total_sq, cross):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = cross - total * total.T / count
+        variance = total_sq - np.square(total) / count
+        matrix = covariance / np.sqrt(variance * variance.T)
+    matrix[(count < 2) | ~np.isfinite(matrix)] = np.nan
+    diagonal = np.diag(variance) > 0
+    matrix[np.diag_indices_from(matrix)] = np.where(diagonal, 1.0, np.nan)
+    return np.clip(matrix, -1.0, 1.0)
+
+
+def spearman_matrix(df, columns):
+    # Ranks each column once (equal to pandas' per-pair ranking when there are
+    # no NaNs); the ranks are dropped as soon as the matrix is computed
+    ranks = df[list(columns)].rank().to_numpy(dtype=np.float64, na_value=np.nan)
+    return _correlation_matrix(*_sufficient_stats(ranks, _column_means(ranks)))
+
+
+class CorrelationEngine:
+    # Pearson and Spearman matrices over a fixed set of numeric columns, with
+    # NaNs handled pairwise like DataFrame.corr(). Only Pearson sufficient
+    # statistics are kept, so append() folds in new rows without rescanning
+    # earlier ones and memory does not grow with the rows. Spearman needs
+    # global ranks: it is computed from the frame passed with the request and
+    # only the resulting matrix is cached (until the next append).
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.shift = None
+        self.count = np.zeros((size, size))
+        self.total = np.zeros((size, size))
+        self.total_sq = np.zeros((size, size))
+        self.cross = np.zeros((size, size))
+        self.rows = 0
+        self.matrices = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        engine = cls(columns or numeric_columns(df))
+        engine.append(df)
+        return engine
+
+    def append(self, df):
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        with self.lock:
+            if self.shift is None:
+                self.shift = _column_means(values)
+            stats = _sufficient_stats(values, self.shift)
+            for accumulated, update in zip((self.count, self.total, self.total_sq, self.cross), stats):
+                accumulated += update
+            self.rows += len(values)
+            self.matrices.clear()
+
+    def _compute(self, method, df):
+        if method == 'pearson':
+            return _correlation_matrix(self.count, self.total, self.total_sq, self.cross)
+        if df is None:
+            raise ValueError("Spearman correlations are computed from the data; pass df")
+        return spearman_matrix(df, self.columns)
+
+    def _full(self, method, df=None):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        with self.lock:
+            if method not in self.matrices:
+                self.matrices[method] = pd.DataFrame(
+                    self._compute(method, df), index=self.columns, columns=self.columns)
+            return self.matrices[method]
+
+    def matrix(self, columns=None, method='pearson', df=None):
+        # `df` (the rows the engine was built from) is only read for Spearman
+        full = self._full(method, df)
+        if columns is None:
+            return full.copy()
+        unknown = [c for c in columns if c not in full.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return full.loc[columns, columns]
+
+    def column(self, name, method='pearson', columns=None, df=None):
+        # Correlation of every other column with `name`
+        full = self._full(method, df)
+        if name not in full.columns:
+            raise ValueError(f"Unknown columns: {name}")
+        values = full[name].drop(name)
+        return values if columns is None else values.reindex([c for c in columns if c != name])
+
+
+@tracked_cache('correlation_engine', st.cache_resource(show_spinner=False, max_entries=16))
+def _cached_engine(fingerprint, _df):
+    return CorrelationEngine.from_frame(_df)
+
+
+def get_correlation_engine(df):
+    # One engine per dataset version, shared by every tab and the chat assistant
+    if is_out_of_core(df):
+        from components.out_of_core import streamed_correlation_engine
+        return streamed_correlation_engine(df)
+    return _cached_engine(data_fingerprint(df), df)
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+DATA_PATH = "High Note data.xlsx"
+DICTIONARY_PATH = "High Note data dictionary.xlsx"
+CACHE_DIR = os.getenv("HIGHNOTE_CACHE_DIR", ".cache")
+
+# Rows per chunk when streaming files that may not fit in memory
+CHUNK_ROWS = 100_000
+
+# Bump when the on-disk layout changes so old caches get rebuilt
+CACHE_VERSION = 3
+
+
+def _file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_info(path, with_hash=True):
+    stat = os.stat(path)
+    info = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        info["sha256"] = _file_sha256(path)
+    return info
+
+
+def cache_paths(cache_dir):
+    return {
+        "data": os.path.join(cache_dir, "high_note_data.arrow"),
+        "dictionary": os.path.join(cache_dir, "high_note_dictionary.arrow"),
+        "manifest": os.path.join(cache_dir, "manifest.json"),
+    }
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomic(path, write_fn):
+    # Unique per thread too: warm-up threads may publish the same file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_arrow(df, path):
+    # Uncompressed Arrow IPC in a single record batch, so later starts can
+    # memory-map the file and use its columns without concatenating chunks
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression="uncompressed",
+                                                         chunksize=max(len(df), 1)))
+
+
+def _write_manifest(manifest, path):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+    write_atomic(path, write)
+
+
+def _is_fresh(manifest, sources, paths):
+    # Cheap check first (size + mtime), falling back to the content hash so a
+    # touched or re-copied workbook does not force a full Excel parse
+    if manifest is None or manifest.get("version") != CACHE_VERSION:
+        return False, False
+    if not all(os.path.exists(p) for p in (paths["data"], paths["dictionary"])):
+        return False, False
+
+    cached_sources = manifest.get("sources", {})
+    if set(cached_sources) != set(sources):
+        return False, False
+
+    stale_stat = False
+    for name, path in sources.items():
+        cached = cached_sources[name]
+        current = _source_info(path, with_hash=False)
+        if current["size"] != cached["size"]:
+            return False, False
+        if current["mtime_ns"] != cached["mtime_ns"]:
+            if _file_sha256(path) != cached["sha256"]:
+                return False, False
+            stale_stat = True
+    return True, stale_stat
+
+
+def _fingerprint(source_infos):
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for name in sorted(source_infos):
+        digest.update(f"{name}:{source_infos[name]['sha256']}".encode())
+    return digest.hexdigest()[:16]
+
+
+def column_schema(dict_df):
+    # Derive a role for every documented variable from the data dictionary text
+    schema = {}
+    for _, row in dict_df.iterrows():
+        variable = str(row["Variable"]).strip()
+        description = str(row.get("Description", "")).lower()
+        if description.strip() == "nan":
+            description = ""
+        if variable == "net_user" or description.endswith(" id"):
+            role = "id"
+        elif "move from / into" in description:
+            role = "transition"
+        elif "if 1" in description or "=1" in description.replace(" ", ""):
+            role = "flag"
+        elif "proportion" in description or "average" in description:
+            role = "ratio"
+        else:
+            role = "count"
+        schema[variable] = role
+    return schema
+
+
+def _is_integral(series):
+    values = series.to_numpy()
+    return not series.isna().any() and np.array_equal(values, np.round(values))
+
+
+def _narrow_column(series, role):
+    if role == "id":
+        return series
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        # Low-cardinality text fields become categoricals
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            if series.nunique(dropna=True) <= max(len(series) // 2, 1):
+                return series.astype("category")
+        return series
+
+    if role == "flag" and series.dropna().isin([0, 1]).all() and not series.isna().any():
+        # One byte per flag; kept numeric (not bool) so the 0/1 labels and
+        # `df['adopter'] == 1` filters used by the tabs behave as before
+        return series.astype(np.uint8)
+
+    if pd.api.types.is_integer_dtype(series) or (role in ("count", "transition") and _is_integral(series)):
+        series = series.astype(np.int64)
+        downcast = "unsigned" if series.min() >= 0 else "integer"
+        return pd.to_numeric(series, downcast=downcast)
+
+    return series.astype(np.float32)
+
+
+def optimize_dtypes(df, dict_df):
+    # Pick the narrowest safe dtype per column, guided by the data dictionary
+    schema = column_schema(dict_df)
+    compact = df.copy()
+    for column in compact.columns:
+        compact[column] = _narrow_column(compact[column], schema.get(column, "count"))
+    return compact
+
+
+def memory_usage_bytes(df):
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def read_source(path):
+    # The workbook, or a CSV/Parquet export of the same table (Excel tops out
+    # at about a million rows)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(path)
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+
+def build_cache(data_path=DATA_PATH, dict_path=DICTIONARY_PATH, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = cache_paths(cache_dir)
+    sources = {"data": data_path, "dictionary": dict_path}
+
+    start = time.perf_counter()
+    df = read_source(data_path)
+    dict_df = pd.read_excel(dict_path)
+
+    memory_before = memory_usage_bytes(df)
+    df = optimize_dtypes(df, dict_df)
+    memory_after = memory_usage_bytes(df)
+
+    _write_arrow(df, paths["data"])
+    _write_arrow(dict_df, paths["dictionary"])
+
+    source_infos = {name: _source_info(path) for name, path in sources.items()}
+    manifest = {
+        "version": CACHE_VERSION,
+        "sources": source_infos,
+        "fingerprint": _fingerprint(source_infos),
+        "rows": len(df),
+        "memory_before": memory_before,
+        "memory_after": memory_after,
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+    _write_manifest(manifest, paths["manifest"])
+    return manifest
+
+
+def ensure_cache(data_path=DATA_PATH, dict_path=DICTIONARY_PATH, cache_dir=CACHE_DIR):
+    paths = cache_paths(cache_dir)
+    sources = {"data": data_path, "dictionary": dict_path}
+    manifest = _read_manifest(paths["manifest"])
+
+    fresh, stale_stat = _is_fresh(manifest, sources, paths)
+    if not fresh:
+        return build_cache(data_path, dict_path, cache_dir)
+
+    if stale_stat:
+        # Content unchanged, only the timestamps moved: refresh them so the next
+        # start takes the cheap path again
+        for name, path in sources.items():
+            manifest["sources"][name].update(_source_info(path, with_hash=False))
+        _write_manifest(manifest, paths["manifest"])
+    return manifest
+
+
+def read_cached_frame(path):
+    # split_blocks keeps one block per column, so null-free numeric columns
+    # become read-only views of the mapped file instead of copies: every
+    # session and worker process reading the cache shares the same pages
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def shared_bytes(df):
+    # Bytes of the columns that are views of a memory-mapped file
+    total = 0
+    for _, column in df.items():
+        values = column.to_numpy()
+        if isinstance(values, np.ndarray) and not values.flags.writeable:
+            total += values.nbytes
+    return total
+
+
+def iter_chunks(source, columns=None, chunk_rows=CHUNK_ROWS):
+    # Stream a DataFrame, CSV, Parquet or Arrow/Feather file in bounded chunks
+    if isinstance(source, pd.DataFrame):
+        source = source if columns is None else source[columns]
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+        return
+
+    extension = os.path.splitext(source)[1].lower()
+    if extension == ".csv":
+        yield from pd.read_csv(source, usecols=columns, chunksize=chunk_rows)
+    elif extension == ".parquet":
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif extension in (".arrow", ".feather"):
+        table = feather.read_table(source, columns=columns, memory_map=True)
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported input format: {source}")
+
+
+def is_out_of_core(df):
+    # Frames opened by components.out_of_core are a bounded sample standing in
+    # for a chunked file; the shared accessors stream the file instead
+    return "out_of_core" in df.attrs
+
+
+def data_fingerprint(df):
+    # Identifies a frame for cache keys. Shape and columns are mixed in so that
+    # slices of a loaded frame (which inherit attrs) never alias the full table
+    base = df.attrs.get("fingerprint")
+    if base is None:
+        base = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()[:16]
+    shape_key = f"{base}:{df.shape[0]}:{','.join(map(str, df.columns))}"
+    return hashlib.sha256(shape_key.encode()).hexdigest()[:16]
+
+
+def load_dataset(data_path=DATA_PATH, dict_path=DICTIONARY_PATH, cache_dir=CACHE_DIR):
+    manifest = ensure_cache(data_path, dict_path, cache_dir)
+    paths = cache_paths(cache_dir)
+
+    df = read_cached_frame(paths["data"])
+    dict_df = read_cached_frame(paths["dictionary"])
+    df.attrs["fingerprint"] = manifest["fingerprint"]
+    df.attrs["memory_before"] = manifest["memory_before"]
+    df.attrs["memory_after"] = memory_usage_bytes(df)
+    df.attrs["shared"] = paths["data"]
+    df.attrs["memory_shared"] = shared_bytes(df)
+    return df, dict_df
+
+
+def format_memory_report(df):
+    if is_out_of_core(df):
+        return (f"Out-of-core: {df.attrs['n_rows']:,} rows streamed from {df.attrs['out_of_core']}; "
+                f"{len(df):,}-row sample in memory ({memory_usage_bytes(df) / 2**20:.1f} MB)")
+    before = df.attrs.get("memory_before")
+    after = df.attrs.get("memory_after", memory_usage_bytes(df))
+    report = f"In-memory size: {after / 2**20:.1f} MB"
+    if before:
+        report += f" (vs {before / 2**20:.1f} MB with default dtypes, {before / max(after, 1):.1f}x smaller)"
+    if df.attrs.get("memory_shared"):
+        report += f"; {df.attrs['memory_shared'] / 2**20:.1f} MB memory-mapped and shared between sessions"
+    return report
+
+
+if __name__ == "__main__":
+    # Pre-build the columnar cache, e.g. as part of a deploy step
+    manifest = build_cache()
+    print(f"Cached {manifest['rows']:,} rows in {manifest['build_seconds']}s "
+          f"(fingerprint {manifest['fingerprint']})")
+    print(f"Memory: {manifest['memory_before'] / 2**20:.1f} MB -> "
+          f"{manifest['memory_after'] / 2**20:.1f} MB")
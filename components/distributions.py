@@ -0,0 +1,222 @@
+import numpy as np
+import streamlit as st
+
+from components.aggregates import WEIGHT_COLUMN, weighted_quantiles
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.instrumentation import tracked_cache
+
+# Heavy-tailed counts get log-spaced bins so the bulk near zero stays visible
+LOG_BINNED_METRICS = {'songsListened', 'friend_cnt', 'lovedTracks', 'shouts', 'subscriber_friend_cnt'}
+
+DEFAULT_BINS = 50
+MAX_OUTLIERS = 200
+KDE_GRID_SIZE = 256
+
+
+def _clean(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def use_log_bins(column, values):
+    return column in LOG_BINNED_METRICS and len(values) > 0 and values.min() >= 0
+
+
+def histogram_edges(values, log=False, n_bins=DEFAULT_BINS):
+    if len(values) == 0:
+        return np.array([0.0, 1.0])
+    return edges_from_range(values.min(), values.max(), np.array_equal(values, np.round(values)),
+                            log=log, n_bins=n_bins)
+
+
+def edges_from_range(low, high, integral, log=False, n_bins=DEFAULT_BINS):
+    # Bin edges from the value range alone, so streamed data can be binned
+    # before it is read
+    if log:
+        # Zeros get their own [0, 1) bin; everything else is split geometrically
+        upper = np.geomspace(1, max(high, 1) + 1, n_bins)
+        return np.concatenate([[0.0], upper])
+
+    if integral and high - low <= n_bins:
+        # Small integer ranges: one bar per value, centred on the integer
+        return np.arange(low - 0.5, high + 1.5)
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    return np.linspace(low, high, n_bins + 1)
+
+
+def bin_centers(edges, log=False):
+    if not log:
+        return (edges[:-1] + edges[1:]) / 2
+
+    # Geometric centres are evenly spaced on a log axis; the zero bin is placed
+    # one step to the left of the first positive bin
+    centers = np.sqrt(edges[1:-1] * edges[2:])
+    ratio = edges[2] / edges[1] if len(edges) > 2 else 2.0
+    return np.concatenate([[centers[0] / ratio if len(centers) else 0.5], centers])
+
+
+def box_stats(values, max_outliers=MAX_OUTLIERS, seed=0, weights=None):
+    # `weights` (aligned with values, which must then have no NaNs) turn the
+    # statistics into population estimates from a weighted sample
+    if weights is None:
+        values = _clean(values)
+    if len(values) == 0:
+        return None
+    if weights is None:
+        weights = np.ones(len(values))
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+    else:
+        q1, median, q3 = weighted_quantiles(values, weights, [0.25, 0.5, 0.75])
+
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    lowerfence, upperfence = inside.min(), inside.max()
+
+    is_outlier = (values < lowerfence) | (values > upperfence)
+    outliers = values[is_outlier]
+    n_outliers = int(round(weights[is_outlier].sum()))
+    if len(outliers) > max_outliers:
+        # Keep the extremes and a reproducible sample of the rest, so payload size
+        # is capped no matter how many rows there are
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(outliers, size=max_outliers - 2, replace=False)
+        outliers = np.concatenate([[outliers.min(), outliers.max()], sample])
+
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(lowerfence),
+        'upperfence': float(upperfence),
+        'mean': float(np.average(values, weights=weights)),
+        'count': int(round(weights.sum())),
+        'outliers': np.sort(outliers),
+        'n_outliers': int(n_outliers),
+    }
+
+
+def silverman_bandwidth(values, weights=None):
+    # Same rule Plotly uses for violins; weighted spread for weighted samples,
+    # with the sample size still setting how much to smooth
+    if weights is None:
+        std = values.std(ddof=1) if len(values) > 1 else 0.0
+        q1, q3 = np.percentile(values, [25, 75])
+    else:
+        mean = np.average(values, weights=weights)
+        n = len(values)
+        std = np.sqrt(np.average((values - mean) ** 2, weights=weights) * n / (n - 1)) if n > 1 else 0.0
+        q1, q3 = weighted_quantiles(values, weights, [0.25, 0.75])
+    return bandwidth_from_stats(std, q1, q3, len(values))
+
+
+def bandwidth_from_stats(std, q1, q3, count):
+    spread = min(std, (q3 - q1) / 1.349) or std
+    return 1.059 * spread * count ** (-1 / 5) if spread > 0 else 0.0
+
+
+def binned_kde(values, grid_size=KDE_GRID_SIZE, bandwidth=None, cut=2.0, weights=None):
+    # Gaussian KDE on a regular grid: linear binning of the samples followed by
+    # an FFT convolution with the sampled kernel, O(n + g log g) instead of the
+    # O(n * g) direct sum the browser would do. `weights` as in box_stats
+    if weights is None:
+        values = _clean(values)
+    if len(values) == 0:
+        return None
+    if bandwidth is None:
+        bandwidth = silverman_bandwidth(values, weights)
+    bandwidth = kde_bandwidth(bandwidth, values.min())
+    grid = kde_grid(values.min(), values.max(), bandwidth, grid_size, cut)
+    total = len(values) if weights is None else weights.sum()
+    return smooth_kde(linear_binning(values, grid, weights), grid, bandwidth, total)
+
+
+def kde_bandwidth(bandwidth, low):
+    # Constant column: fall back to a narrow kernel around the single value
+    return bandwidth if bandwidth > 0 else max(abs(low) * 1e-3, 1e-3)
+
+
+def kde_grid(low, high, bandwidth, grid_size=KDE_GRID_SIZE, cut=2.0):
+    return np.linspace(low - cut * bandwidth, high + cut * bandwidth, grid_size)
+
+
+def linear_binning(values, grid, weights=None):
+    # Sample weights spread over the two nearest grid points; additive, so
+    # chunks of a column can be binned separately and summed
+    grid_size = len(grid)
+    delta = grid[1] - grid[0]
+    position = (values - grid[0]) / delta
+    index = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    fraction = position - index
+    weights = np.ones(len(values)) if weights is None else weights
+    return (np.bincount(index, weights=weights * (1 - fraction), minlength=grid_size)
+            + np.bincount(index + 1, weights=weights * fraction, minlength=grid_size))
+
+
+def smooth_kde(weights, grid, bandwidth, count):
+    grid_size = len(grid)
+    delta = grid[1] - grid[0]
+    half_width = min(grid_size, int(np.ceil(4 * bandwidth / delta)))
+    offsets = np.arange(-half_width, half_width + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+
+    size = grid_size + len(kernel) - 1
+    n_fft = 1 << int(np.ceil(np.log2(size)))
+    smoothed = np.fft.irfft(np.fft.rfft(weights, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)
+    density = smoothed[half_width:half_width + grid_size] / count
+
+    return {
+        'x': grid,
+        'density': np.clip(density, 0, None),
+        'bandwidth': float(bandwidth),
+    }
+
+
+def summarize_distribution(df, column, by='adopter', n_bins=DEFAULT_BINS):
+    # Everything needed to draw a histogram, box or violin for `column` split by
+    # `by`, in a size that does not depend on the number of rows
+    all_values = _clean(df[column])
+    log = use_log_bins(column, all_values)
+    edges = histogram_edges(all_values, log=log, n_bins=n_bins)
+
+    # Weighted preview samples (see components.sampling): bar heights, box
+    # statistics and KDE shapes are population estimates, so oversampled
+    # strata do not skew them
+    weights = df[WEIGHT_COLUMN] if WEIGHT_COLUMN in df.columns else None
+    groups = {}
+    for group, values in df.groupby(by, observed=True, sort=True)[column]:
+        if weights is None:
+            values = _clean(values)
+            counts, _ = np.histogram(values, bins=edges)
+            groups[group] = {'counts': counts, 'box': box_stats(values), 'kde': binned_kde(values)}
+            continue
+        present = values.notna()
+        row_weights = weights.loc[values.index][present].to_numpy(dtype=np.float64)
+        values = values[present].to_numpy(dtype=np.float64)
+        counts, _ = np.histogram(values, bins=edges, weights=row_weights)
+        groups[group] = {
+            'counts': np.round(counts).astype(np.int64),
+            'box': box_stats(values, weights=row_weights),
+            'kde': binned_kde(values, weights=row_weights),
+        }
+
+    return {
+        'column': column,
+        'by': by,
+        'log': log,
+        'edges': edges,
+        'centers': bin_centers(edges, log=log),
+        'groups': groups,
+    }
+
+
+@tracked_cache('distribution_summary', st.cache_data(show_spinner=False, max_entries=256))
+def _cached_summary(fingerprint, column, by, n_bins, _df):
+    return summarize_distribution(_df, column, by=by, n_bins=n_bins)
+
+
+def get_distribution_summary(df, column, by='adopter', n_bins=DEFAULT_BINS):
+    if is_out_of_core(df):
+        from components.out_of_core import streamed_distribution_summary
+        return streamed_distribution_summary(df, column, by=by, n_bins=n_bins)
+    return _cached_summary(data_fingerprint(df), column, by, n_bins, df)
@@ -1,41 +1,56 @@
 import streamlit as st
 import plotly.express as px
+from components.aggregates import get_aggregate_cube, group_size, group_stat
+from components.charts import box_figure, violin_figure
+from components.instrumentation import plotly_chart, traced
 
+@traced
 def show_geography_tab(df):
     st.header("Geographic Analysis")
 
+    cube = get_aggregate_cube(df)
+    adoption_by_country = group_stat(cube, 'good_country', 'mean')['adopter']
+
     col1, col2 = st.columns(2)
     with col1:
-        country_dist = df.groupby('good_country')['adopter'].mean().reset_index()
+        country_dist = adoption_by_country.reset_index()
         fig = px.bar(country_dist, x='good_country', y='adopter',
                      title="Premium Adoption by Region",
                      color='adopter',
                      color_continuous_scale=['#4ECDC4', '#FF6B6B'])
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     with col2:
-        country_counts = df[df['adopter'] == 1]['good_country'].value_counts()
+        # Premium users per country type = group size x adoption rate
+        country_counts = (group_size(cube, 'good_country') * adoption_by_country).round().astype(int)
+        country_counts = country_counts[country_counts > 0].sort_values(ascending=False)
         fig = px.pie(values=country_counts.values,
                      names=country_counts.index,
                      title="Premium Users Distribution by Country Type",
                      color_discrete_sequence=['#FF6B6B', '#4ECDC4'])
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     # Add friend country analysis
     st.subheader("Friend Network Geographic Analysis")
     col3, col4 = st.columns(2)
 
+    box, violin = friend_country_figures(df)
     with col3:
-        fig = px.box(df, x='adopter', y='friend_country_cnt',
-                     color='adopter',
-                     title="Friend Countries Distribution",
-                     color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(box, use_container_width=True)
 
     with col4:
-        fig = px.violin(df, x='adopter', y='friend_country_cnt',
-                        color='adopter',
-                        box=True,
-                        title="Friend Countries Distribution (Detailed)",
-                        color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'})
-        st.plotly_chart(fig, use_container_width=True) 
\ No newline at end of file
+        plotly_chart(violin, use_container_width=True)
+
+def friend_country_figures(df):
+    box = box_figure(df, 'friend_country_cnt',
+                     title="Friend Countries Distribution",
+                     color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+    violin = violin_figure(df, 'friend_country_cnt',
+                           title="Friend Countries Distribution (Detailed)",
+                           color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+    return box, violin
+
+def warm_up(df):
+    # Caches behind the tab (see components/warmup.py)
+    get_aggregate_cube(df)
+    friend_country_figures(df) 
\ No newline at end of file
@@ -0,0 +1,370 @@
+import contextlib
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import streamlit as st
+
+from components.data_loader import CACHE_DIR
+
+# Lightweight spans around the hot paths (tabs, data loading, training, the
+# OpenAI call). Wall time and cache hits/misses are always recorded; peak
+# memory (tracemalloc) and figure payload sizes cost time of their own and are
+# switched on from the debug panel or the environment. Finished spans feed
+# process-wide totals, exported as Prometheus text (HIGHNOTE_METRICS_PORT) and
+# as JSON lines (HIGHNOTE_METRICS_JSONL).
+METRICS_JSONL = os.getenv('HIGHNOTE_METRICS_JSONL')
+PROFILE_DIR = os.path.join(CACHE_DIR, 'profiles')
+RECENT_SPANS = 500
+
+options = {
+    'trace_memory': os.getenv('HIGHNOTE_TRACE_MEMORY') == '1',
+    'figure_bytes': os.getenv('HIGHNOTE_FIGURE_BYTES') == '1',
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_span_totals = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0, 'figures': 0, 'figure_bytes': 0})
+_cache_totals = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_recent = deque(maxlen=RECENT_SPANS)
+_metrics_server = None
+
+
+class Span:
+
+    def __init__(self, name, stack):
+        self.name = name
+        self.stack = stack
+        self.children = []
+        self.cache = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.figures = []
+        self.started = time.time()
+        self.wall = None
+        self.base = None
+        self.peak = 0
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'started': round(self.started, 3),
+            'seconds': round(self.wall, 6),
+            'peak_bytes': self.peak if self.base is not None else None,
+            'cache': dict(self.cache),
+            'figure_bytes': self.figures,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def _open(name):
+    stack = _stack()
+    current = Span(name, stack)
+    if tracemalloc.is_tracing():
+        # Peaks are measured from the span's start; the parent's peak so far is
+        # folded in before the high-water mark is reset for the child
+        size, peak = tracemalloc.get_traced_memory()
+        for parent in stack:
+            if parent.base is not None:
+                parent.peak = max(parent.peak, peak - parent.base)
+        tracemalloc.reset_peak()
+        current.base = size
+    stack.append(current)
+    current.start = time.perf_counter()
+    return current
+
+
+def _close(current):
+    current.wall = time.perf_counter() - current.start
+    stack = current.stack
+    # remove() rather than pop(): a traced stream may be closed out of order
+    index = stack.index(current)
+    parent = stack[index - 1] if index else None
+    stack.remove(current)
+
+    if current.base is not None and tracemalloc.is_tracing():
+        current.peak = max(current.peak, tracemalloc.get_traced_memory()[1] - current.base)
+        if parent is not None and parent.base is not None:
+            parent.peak = max(parent.peak, current.base + current.peak - parent.base)
+
+    with _lock:
+        totals = _span_totals[current.name]
+        totals['calls'] += 1
+        totals['seconds'] += current.wall
+        totals['peak_bytes'] = max(totals['peak_bytes'], current.peak)
+        totals['figures'] += len(current.figures)
+        totals['figure_bytes'] += sum(current.figures)
+
+    if parent is not None:
+        parent.children.append(current)
+        return
+
+    record = current.to_dict()
+    with _lock:
+        _recent.append(record)
+        if METRICS_JSONL:
+            with open(METRICS_JSONL, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run['spans'].append(record)
+
+
+@contextlib.contextmanager
+def span(name):
+    current = _open(name)
+    try:
+        yield current
+    finally:
+        _close(current)
+
+
+def traced(name=None):
+    # Decorator: @traced or @traced('train_model')
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+
+    if callable(name):
+        func, name = name, None
+        return decorate(func)
+    return decorate
+
+
+def traced_stream(name, chunks):
+    # Span over the consumption of a streamed response
+    with span(name):
+        yield from chunks
+
+
+def _cache_misses():
+    if not hasattr(_local, 'cache_misses'):
+        _local.cache_misses = defaultdict(int)
+    return _local.cache_misses
+
+
+def _record_cache(name, hit):
+    result = 'hits' if hit else 'misses'
+    with _lock:
+        _cache_totals[name][result] += 1
+    for open_span in _stack():
+        open_span.cache[name][result] += 1
+
+
+def tracked_cache(name, cache):
+    # Wraps an st.cache_data / st.cache_resource decorator so each lookup is
+    # counted as a hit or a miss (the cached body ran)
+    def decorate(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _cache_misses()[name] += 1
+            return func(*args, **kwargs)
+        # Streamlit reads parameter names (underscore = unhashed) from here
+        compute.__signature__ = inspect.signature(func)
+        cached = cache(compute)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            misses = _cache_misses()
+            before = misses[name]
+            result = cached(*args, **kwargs)
+            _record_cache(name, misses[name] == before)
+            return result
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+
+def plotly_chart(fig, **kwargs):
+    # st.plotly_chart that records the figure's JSON size when enabled
+    if options['figure_bytes']:
+        stack = _stack()
+        if stack:
+            stack[-1].figures.append(len(fig.to_json(validate=False)))
+    return st.plotly_chart(fig, **kwargs)
+
+
+def set_options(trace_memory=None, figure_bytes=None):
+    if trace_memory is not None:
+        options['trace_memory'] = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    if figure_bytes is not None:
+        options['figure_bytes'] = figure_bytes
+
+
+def begin_run(profile=False):
+    # Collects the top-level spans of one script run; with profile=True the
+    # run is also captured with cProfile (see end_run)
+    set_options(trace_memory=options['trace_memory'])
+    stale = getattr(_local, 'run', None)
+    if stale is not None and stale['profiler'] is not None:
+        # The previous run on this thread ended without end_run (an exception
+        # or st.rerun/st.stop): stop its profiler rather than leave it running
+        stale['profiler'].disable()
+    run = {'started': time.time(), 'spans': [], 'profile': None, 'profiler': None}
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            run['profiler'] = profiler
+        except ValueError:
+            # Another profiler is already active in this thread
+            pass
+    _local.run = run
+    return run
+
+
+def end_run():
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return None
+    _local.run = None
+    profiler = run.pop('profiler')
+    if profiler is not None:
+        profiler.disable()
+        # pstats format: readable with pstats, snakeviz or flameprof
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        run['profile'] = os.path.join(PROFILE_DIR, time.strftime('rerun-%Y%m%d-%H%M%S.prof'))
+        profiler.dump_stats(run['profile'])
+    run['seconds'] = time.time() - run['started']
+    return run
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    with _lock:
+        spans = {name: dict(totals) for name, totals in _span_totals.items()}
+        caches = {name: dict(totals) for name, totals in _cache_totals.items()}
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+        lines.extend(f'{name}{{{labels}}} {value}' for labels, value in samples)
+
+    metric('highnote_span_seconds_total', 'counter', 'Wall time spent in instrumented spans.',
+           [(f'span="{_label(name)}"', round(t['seconds'], 6)) for name, t in spans.items()])
+    metric('highnote_span_calls_total', 'counter', 'Completed instrumented spans.',
+           [(f'span="{_label(name)}"', t['calls']) for name, t in spans.items()])
+    metric('highnote_span_peak_bytes', 'gauge', 'Largest traced allocation peak within a span.',
+           [(f'span="{_label(name)}"', t['peak_bytes']) for name, t in spans.items() if t['peak_bytes']])
+    metric('highnote_figure_payload_bytes_total', 'counter', 'JSON bytes of Plotly figures sent by a span.',
+           [(f'span="{_label(name)}"', t['figure_bytes']) for name, t in spans.items() if t['figures']])
+    metric('highnote_figures_total', 'counter', 'Plotly figures sent by a span.',
+           [(f'span="{_label(name)}"', t['figures']) for name, t in spans.items() if t['figures']])
+    metric('highnote_cache_requests_total', 'counter', 'Cache lookups by result.',
+           [(f'cache="{_label(name)}",result="{result[:-1]}"', count)
+            for name, totals in caches.items() for result, count in totals.items()])
+    return '\n'.join(lines) + '\n'
+
+
+def recent_spans_jsonl():
+    with _lock:
+        return ''.join(json.dumps(record) + '\n' for record in _recent)
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    # Prometheus scrape endpoint on /metrics, started once per process
+    global _metrics_server
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
+
+
+def _flatten(records, depth=0):
+    for record in records:
+        hits = sum(c['hits'] for c in record['cache'].values())
+        misses = sum(c['misses'] for c in record['cache'].values())
+        yield {
+            'span': '  ' * depth + record['name'],
+            'ms': round(record['seconds'] * 1000, 1),
+            'peak MB': None if record['peak_bytes'] is None else round(record['peak_bytes'] / 2**20, 2),
+            'cache hits': hits,
+            'cache misses': misses,
+            'figures': len(record['figure_bytes']),
+            'figure KB': round(sum(record['figure_bytes']) / 1024, 1),
+        }
+        yield from _flatten(record['children'], depth + 1)
+
+
+def show_debug_panel(run):
+    # Timings of this run, process totals, exports and profiling switches
+    with st.expander("⏱️ Performance"):
+        if run is not None:
+            st.caption(f"This run: {run['seconds'] * 1000:.0f} ms")
+            st.dataframe(pd.DataFrame(list(_flatten(run['spans']))), use_container_width=True, hide_index=True)
+
+        with _lock:
+            totals = pd.DataFrame.from_dict({name: dict(t) for name, t in _span_totals.items()}, orient='index')
+            caches = pd.DataFrame.from_dict({name: dict(t) for name, t in _cache_totals.items()}, orient='index')
+        if not totals.empty:
+            st.markdown("**Process totals**")
+            st.dataframe(totals.sort_values('seconds', ascending=False), use_container_width=True)
+        if not caches.empty:
+            caches['hit rate'] = (caches['hits'] / (caches['hits'] + caches['misses'])).round(3)
+            st.dataframe(caches, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            trace_memory = st.checkbox("Track peak memory", value=options['trace_memory'], key='perf_trace_memory')
+            figure_bytes = st.checkbox("Measure figure payloads", value=options['figure_bytes'],
+                                       key='perf_figure_bytes')
+            set_options(trace_memory=trace_memory, figure_bytes=figure_bytes)
+            st.checkbox("Profile the next rerun", key='perf_profile_next')
+        with col2:
+            st.download_button("Prometheus metrics", prometheus_text(), file_name='highnote_metrics.prom')
+            st.download_button("Recent spans (JSON lines)", recent_spans_jsonl(), file_name='highnote_spans.jsonl')
+
+        if run is not None and run['profile']:
+            stats = io.StringIO()
+            pstats.Stats(run['profile'], stream=stats).sort_stats('cumulative').print_stats(20)
+            st.caption(f"Profile saved to {run['profile']}")
+            st.code(stats.getvalue())
+            with open(run['profile'], 'rb') as f:
+                st.download_button("Download profile (.prof)", f.read(), file_name=os.path.basename(run['profile']))
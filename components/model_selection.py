@@ -0,0 +1,155 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.inspection import permutation_importance
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (accuracy_score, average_precision_score, f1_score, precision_recall_curve,
+                             precision_score, recall_score, roc_auc_score, roc_curve)
+from sklearn.model_selection import HalvingGridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from components.data_loader import write_atomic
+
+CURVE_POINTS = 201
+
+
+def make_candidates(params):
+    # Candidate models compared by cross-validation. Each fit is single-threaded;
+    # the search parallelises across candidates and folds instead.
+    seed = params['random_state']
+    candidates = {
+        'random_forest': RandomForestClassifier(
+            n_estimators=params['n_estimators'], random_state=seed, n_jobs=1),
+        'hist_gradient_boosting': HistGradientBoostingClassifier(
+            max_iter=500, early_stopping=True, n_iter_no_change=10, random_state=seed),
+        'logistic_regression': LogisticRegression(max_iter=1000),
+    }
+    return {name: candidates[name] for name in params['candidates']}
+
+
+def cached_folds(y, fingerprint, n_splits, seed, folds_dir):
+    # Fold assignment per row, stored once per dataset so every candidate, rerun
+    # and replica cross-validates on identical splits
+    path = os.path.join(folds_dir, f'folds_{fingerprint}_{len(y)}_{n_splits}_{seed}.npy')
+    if os.path.exists(path):
+        fold_of_row = np.load(path)
+    else:
+        fold_of_row = np.empty(len(y), dtype=np.int8)
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+        for fold, (_, test_index) in enumerate(splitter.split(np.zeros(len(y)), y)):
+            fold_of_row[test_index] = fold
+        os.makedirs(folds_dir, exist_ok=True)
+
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                np.save(f, fold_of_row)
+        write_atomic(path, write)
+
+    return [(np.flatnonzero(fold_of_row != fold), np.flatnonzero(fold_of_row == fold))
+            for fold in range(n_splits)]
+
+
+def _leaderboard(search, names):
+    results = pd.DataFrame(search.cv_results_)
+    results['model'] = [names[type(clf)] for clf in results['param_clf']]
+    # Each candidate's score at the largest resource it reached
+    final = results.sort_values('n_resources').groupby('model').tail(1)
+    return [
+        {
+            'model': row['model'],
+            'cv_roc_auc': float(row['mean_test_score']),
+            'cv_roc_auc_std': float(row['std_test_score']),
+            'n_samples': int(row['n_resources']),
+            'fit_seconds': float(row['mean_fit_time']),
+        }
+        for _, row in final.sort_values('mean_test_score', ascending=False).iterrows()
+    ]
+
+
+def _curves(y_true, scores):
+    fpr, tpr, _ = roc_curve(y_true, scores)
+    precision, recall, _ = precision_recall_curve(y_true, scores)
+    grid = np.linspace(0, 1, CURVE_POINTS)
+    # Resampled onto a fixed grid so the stored curves have a constant size
+    return {
+        'roc': {'fpr': grid.tolist(), 'tpr': np.interp(grid, fpr, tpr).tolist()},
+        'pr': {'recall': grid.tolist(),
+               'precision': np.interp(grid, recall[::-1], precision[::-1]).tolist()},
+    }
+
+
+def _feature_importances(model, X_test, y_test, features, seed):
+    if hasattr(model, 'feature_importances_'):
+        values = model.feature_importances_
+    elif hasattr(model, 'coef_'):
+        values = np.abs(model.coef_[0]) / np.abs(model.coef_[0]).sum()
+    else:
+        values = permutation_importance(model, X_test, y_test, scoring='roc_auc',
+                                        n_repeats=5, random_state=seed, n_jobs=-1).importances_mean
+        values = np.clip(values, 0, None)
+    return dict(zip(features, np.asarray(values, dtype=float).tolist()))
+
+
+def select_model(df, features, params, fingerprint, folds_dir, target='adopter'):
+    # Successive halving over the candidates on cached folds, then everything
+    # the prediction tab shows (metrics, curves, importances) computed once
+    start = time.perf_counter()
+    X = df[features]
+    y = df[target].to_numpy()
+    seed = params['random_state']
+
+    # Split the data
+    train_index, test_index = train_test_split(
+        np.arange(len(df)), test_size=params['test_size'], random_state=seed)
+    X_train, X_test = X.iloc[train_index], X.iloc[test_index]
+    y_train, y_test = y[train_index], y[test_index]
+
+    candidates = make_candidates(params)
+    names = {type(estimator): name for name, estimator in candidates.items()}
+    folds = cached_folds(y_train, fingerprint, params['cv_folds'], seed, folds_dir)
+
+    search = HalvingGridSearchCV(
+        Pipeline([('scaler', StandardScaler()), ('clf', next(iter(candidates.values())))]),
+        param_grid=[{'clf': [clone(estimator)]} for estimator in candidates.values()],
+        cv=folds, factor=2, resource='n_samples', min_resources='exhaust',
+        scoring='roc_auc', refit=True, n_jobs=-1, random_state=seed,
+    )
+    search.fit(X_train, y_train)
+
+    pipeline = search.best_estimator_
+    scaler, model = pipeline.named_steps['scaler'], pipeline.named_steps['clf']
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=-1)
+
+    X_test_scaled = scaler.transform(X_test)
+    y_pred = model.predict(X_test_scaled)
+    scores = model.predict_proba(X_test_scaled)[:, 1]
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_test, scores),
+        'average_precision': average_precision_score(y_test, scores),
+    }
+
+    return {
+        'model': model,
+        'scaler': scaler,
+        'model_name': names[type(model)],
+        'features': list(features),
+        'params': dict(params),
+        'metrics': {name: float(value) for name, value in metrics.items()},
+        'leaderboard': _leaderboard(search, names),
+        'curves': _curves(y_test, scores),
+        'feature_importances': _feature_importances(model, X_test_scaled, y_test, features, seed),
+        'fingerprint': fingerprint,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'train_seconds': round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+import joblib
+import sklearn
+import streamlit as st
+
+from components.data_loader import CACHE_DIR, data_fingerprint, write_atomic
+from components.instrumentation import traced, tracked_cache
+from components.model_selection import select_model
+
+MODEL_DIR = os.getenv('HIGHNOTE_MODEL_DIR', os.path.join(CACHE_DIR, 'models'))
+
+# Features and hyperparameters of the prediction tab's model
+FEATURES = ['friend_cnt', 'subscriber_friend_cnt', 'songsListened',
+            'lovedTracks', 'posts', 'playlists', 'shouts']
+DEFAULT_PARAMS = {
+    'candidates': ['random_forest', 'hist_gradient_boosting', 'logistic_regression'],
+    'cv_folds': 5,
+    'n_estimators': 100,
+    'random_state': 42,
+    'test_size': 0.2,
+}
+
+
+def model_key(fingerprint, features, params):
+    # Same data + features + hyperparameters (+ sklearn version, since pickles
+    # are not portable across versions) always maps to the same artifact
+    payload = json.dumps({
+        'fingerprint': fingerprint,
+        'features': list(features),
+        'params': params,
+        'sklearn': sklearn.__version__,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def artifact_path(key, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f'{key}.joblib')
+
+
+def _registry_path(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, 'registry.json')
+
+
+def read_registry(model_dir=MODEL_DIR):
+    try:
+        with open(_registry_path(model_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _register(key, artifact, model_dir=MODEL_DIR):
+    registry = read_registry(model_dir)
+    registry[key] = {
+        'path': os.path.basename(artifact_path(key, model_dir)),
+        'fingerprint': artifact['fingerprint'],
+        'model_name': artifact.get('model_name'),
+        'features': artifact['features'],
+        'params': artifact['params'],
+        'metrics': artifact['metrics'],
+        'trained_at': artifact['trained_at'],
+        'train_seconds': artifact['train_seconds'],
+    }
+
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(registry, f, indent=2)
+    write_atomic(_registry_path(model_dir), write)
+
+
+@traced('train_model')
+def train_artifact(df, features=FEATURES, params=DEFAULT_PARAMS, target='adopter', model_dir=MODEL_DIR):
+    # Cross-validated model selection; see components/model_selection.py
+    return select_model(df, features, params, data_fingerprint(df), model_dir, target=target)
+
+
+def save_artifact(key, artifact, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    write_atomic(artifact_path(key, model_dir), lambda tmp: joblib.dump(artifact, tmp))
+    _register(key, artifact, model_dir)
+
+
+def load_artifact(key, model_dir=MODEL_DIR):
+    path = artifact_path(key, model_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception:
+        # Truncated or incompatible file: treat as missing and retrain
+        return None
+
+
+def load_or_train(df, features=FEATURES, params=DEFAULT_PARAMS, model_dir=MODEL_DIR):
+    key = model_key(data_fingerprint(df), features, params)
+    artifact = load_artifact(key, model_dir)
+    if artifact is None:
+        artifact = train_artifact(df, features, params, model_dir=model_dir)
+        save_artifact(key, artifact, model_dir)
+    artifact['key'] = key
+    return artifact
+
+
+@tracked_cache('model_artifact', st.cache_resource(show_spinner='Loading prediction model...'))
+def _cached_artifact(fingerprint, features, params_json, _df):
+    return load_or_train(_df, list(features), json.loads(params_json))
+
+
+def get_model_artifact(df, features=FEATURES, params=DEFAULT_PARAMS):
+    # Process-wide cache in front of the on-disk registry: the frame is never
+    # hashed, and restarts or other replicas reuse the stored artifact
+    return _cached_artifact(data_fingerprint(df), tuple(features),
+                            json.dumps(params, sort_keys=True), df)
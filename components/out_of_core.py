@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from components.aggregates import QUANTILES, SEGMENT_KEYS, assemble_group_table, numeric_columns
+from components.correlations import CorrelationEngine
+from components.data_loader import (CACHE_DIR, CHUNK_ROWS, DATA_PATH, DICTIONARY_PATH, cache_paths, ensure_cache,
+                                    iter_chunks, write_atomic)
+from components.distributions import (DEFAULT_BINS, LOG_BINNED_METRICS, MAX_OUTLIERS, bandwidth_from_stats,
+                                      bin_centers, edges_from_range, kde_bandwidth, kde_grid, linear_binning,
+                                      smooth_kde)
+from components.sketches import TDigest
+from components.trajectories import TrajectoryEngine
+
+# Out-of-core mode: the data stays in a row-grouped Parquet file and the
+# aggregates behind every tab are computed by streaming over it chunk by chunk,
+# with t-digests for medians and quantiles, so memory does not grow with rows.
+# The app is handed a bounded uniform sample carrying the file in its attrs;
+# the shared accessors (cube, distributions, correlations, trajectories)
+# stream the file whenever they see one.
+
+CHUNKED_PATH = os.path.join(CACHE_DIR, 'chunked', 'high_note_data.parquet')
+ROW_GROUP_ROWS = 100_000
+
+# Rows kept in memory, for the model and lookups that need individual rows
+SAMPLE_ROWS = 50_000
+
+
+def export_chunked(source=None, output=CHUNKED_PATH, row_group_rows=ROW_GROUP_ROWS):
+    # Rewrite any source iter_chunks understands (default: the Arrow cache) as
+    # Parquet with fixed-size row groups, one chunk in memory at a time
+    if source is None:
+        ensure_cache(DATA_PATH, DICTIONARY_PATH, CACHE_DIR)
+        source = cache_paths(CACHE_DIR)['data']
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    def write(tmp):
+        writer = None
+        try:
+            for chunk in iter_chunks(source, chunk_rows=row_group_rows):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table.cast(writer.schema), row_group_size=row_group_rows)
+        finally:
+            if writer is not None:
+                writer.close()
+    write_atomic(output, write)
+    return output
+
+
+def dataset_fingerprint(path):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def sample_rows(source, n_rows=SAMPLE_ROWS, seed=0, chunk_rows=CHUNK_ROWS):
+    # Uniform sample without replacement in one pass: every row gets a random
+    # key and the n_rows smallest keys seen so far are kept
+    rng = np.random.default_rng(seed)
+    sample, keys = None, np.empty(0)
+    for chunk in iter_chunks(source, chunk_rows=chunk_rows):
+        chunk_keys = rng.random(len(chunk))
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        keys = np.concatenate([keys, chunk_keys])
+        if len(sample) > n_rows:
+            keep = np.sort(np.argpartition(keys, n_rows)[:n_rows])
+            sample, keys = sample.iloc[keep].reset_index(drop=True), keys[keep]
+    return sample
+
+
+def open_out_of_core(path=None, dict_path=DICTIONARY_PATH, n_sample=SAMPLE_ROWS):
+    path = path or CHUNKED_PATH
+    if not os.path.exists(path) and path == CHUNKED_PATH:
+        export_chunked(output=path)
+
+    sample = sample_rows(path, n_sample)
+    sample.attrs = {
+        'fingerprint': dataset_fingerprint(path),
+        'out_of_core': path,
+        'n_rows': pq.ParquetFile(path).metadata.num_rows,
+    }
+    return sample, pd.read_excel(dict_path)
+
+
+def _merge_moments(a, b):
+    # Chan et al. pairwise update of count, mean and sum of squared deviations
+    index = a['count'].index.union(b['count'].index)
+    count_a = a['count'].reindex(index, fill_value=0)
+    count_b = b['count'].reindex(index, fill_value=0)
+    mean_a = a['mean'].reindex(index).fillna(0)
+    mean_b = b['mean'].reindex(index).fillna(0)
+    count = count_a + count_b
+    weight = count_b / count.where(count > 0, 1)
+    delta = mean_b - mean_a
+    return {
+        'count': count,
+        'mean': mean_a + delta * weight,
+        'm2': (a['m2'].reindex(index, fill_value=0) + b['m2'].reindex(index, fill_value=0)
+               + delta ** 2 * count_a * weight),
+        'min': pd.concat([a['min'], b['min']]).groupby(level=0).min(),
+        'max': pd.concat([a['max'], b['max']]).groupby(level=0).max(),
+        'size': a['size'].add(b['size'], fill_value=0),
+    }
+
+
+def build_streaming_cube(source, segment_keys=SEGMENT_KEYS, chunk_rows=CHUNK_ROWS):
+    # Same layout as aggregates.build_aggregate_cube; the quartiles come from
+    # one t-digest per (segment, group, column)
+    moments, digests, columns, keys = {}, {}, None, None
+    for chunk in iter_chunks(source, chunk_rows=chunk_rows):
+        if columns is None:
+            columns = numeric_columns(chunk)
+            keys = ['all'] + [key for key in segment_keys if key in chunk.columns]
+        values = chunk[columns].astype(np.float64)
+        array = values.to_numpy()
+        for key in keys:
+            labels = np.zeros(len(chunk), dtype=np.int8) if key == 'all' else chunk[key].to_numpy()
+            grouped = values.groupby(labels, sort=True)
+            count = grouped.count()
+            part = {'count': count, 'mean': grouped.mean(), 'm2': (grouped.var(ddof=0) * count).fillna(0),
+                    'min': grouped.min(), 'max': grouped.max(), 'size': grouped.size()}
+            moments[key] = part if key not in moments else _merge_moments(moments[key], part)
+            for group, rows in grouped.indices.items():
+                block = array[rows]
+                for i, column in enumerate(columns):
+                    digests.setdefault((key, group, column), TDigest()).update(block[:, i])
+
+    cube = {}
+    for key, m in moments.items():
+        count = m['count']
+        stats = pd.concat({
+            'count': count.astype(np.int64),
+            'mean': m['mean'].where(count > 0),
+            'std': np.sqrt(m['m2'] / (count - 1)).where(count > 1),
+            'min': m['min'],
+            'max': m['max'],
+        }, axis=1).swaplevel(axis=1)
+        quantiles = pd.DataFrame({
+            (column, name): [float(digests[key, group, column].quantile(q)) for group in count.index]
+            for column in columns for q, name in QUANTILES.items()
+        }, index=count.index)
+        table = assemble_group_table(stats, quantiles, m['size'].astype(np.int64))
+        if key == 'all':
+            table = table.set_axis(['all'])
+        else:
+            table.index.name = key
+        cube[key] = table
+    return cube
+
+
+def _integral_column(source, column):
+    if str(source).lower().endswith('.parquet'):
+        return pa.types.is_integer(pq.read_schema(source).field(column).type)
+    return False
+
+
+def _keep_outliers(state, values, rng):
+    # Bounded uniform sample of the outliers plus the two extremes
+    state['n_outliers'] += len(values)
+    state['extremes'] = [min(state['extremes'][0], values.min()), max(state['extremes'][1], values.max())]
+    keys = np.concatenate([state['keys'], rng.random(len(values))])
+    kept = np.concatenate([state['outliers'], values])
+    if len(kept) > MAX_OUTLIERS:
+        keep = np.argpartition(keys, MAX_OUTLIERS)[:MAX_OUTLIERS]
+        keys, kept = keys[keep], kept[keep]
+    state['keys'], state['outliers'] = keys, kept
+
+
+def build_streaming_summary(source, column, cube, by='adopter', n_bins=DEFAULT_BINS, seed=0,
+                            chunk_rows=CHUNK_ROWS):
+    # Same output as distributions.summarize_distribution in one pass over
+    # [column, by]: edges, quartiles, fences and bandwidths come from the cube,
+    # histogram counts and KDE weights are additive across chunks
+    if by not in cube:
+        raise ValueError(f"Streaming summaries are grouped by one of {list(cube)}")
+    overall = cube['all'].loc['all', column]
+    log = column in LOG_BINNED_METRICS and overall['count'] > 0 and overall['min'] >= 0
+    edges = edges_from_range(overall['min'], overall['max'], _integral_column(source, column),
+                             log=log, n_bins=n_bins)
+
+    states = {}
+    for group, row in cube[by].iterrows():
+        stats = row[column]
+        if stats['count'] == 0:
+            continue
+        q1, q3 = stats['q25'], stats['q75']
+        bandwidth = kde_bandwidth(
+            bandwidth_from_stats(np.nan_to_num(stats['std']), q1, q3, stats['count']), stats['min'])
+        states[group] = {
+            'stats': stats,
+            'bounds': (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)),
+            'counts': np.zeros(len(edges) - 1, dtype=np.int64),
+            'grid': kde_grid(stats['min'], stats['max'], bandwidth),
+            'bandwidth': bandwidth,
+            'weights': 0.0,
+            'inside': [np.inf, -np.inf],
+            'extremes': [np.inf, -np.inf],
+            'n_outliers': 0,
+            'keys': np.empty(0),
+            'outliers': np.empty(0),
+        }
+
+    rng = np.random.default_rng(seed)
+    for chunk in iter_chunks(source, columns=[column, by], chunk_rows=chunk_rows):
+        for group, values in chunk.groupby(by, observed=True)[column]:
+            state = states.get(group)
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if state is None or len(values) == 0:
+                continue
+            state['counts'] += np.histogram(values, bins=edges)[0]
+            state['weights'] = state['weights'] + linear_binning(values, state['grid'])
+            low, high = state['bounds']
+            inside = (values >= low) & (values <= high)
+            if inside.any():
+                state['inside'] = [min(state['inside'][0], values[inside].min()),
+                                   max(state['inside'][1], values[inside].max())]
+            if not inside.all():
+                _keep_outliers(state, values[~inside], rng)
+
+    groups = {}
+    for group, state in states.items():
+        stats = state['stats']
+        outliers = state['outliers']
+        if state['n_outliers'] > MAX_OUTLIERS:
+            outliers = np.concatenate([state['extremes'], outliers[:MAX_OUTLIERS - 2]])
+        groups[group] = {
+            'counts': state['counts'],
+            'box': {
+                'q1': float(stats['q25']),
+                'median': float(stats['median']),
+                'q3': float(stats['q75']),
+                'lowerfence': float(state['inside'][0]),
+                'upperfence': float(state['inside'][1]),
+                'mean': float(stats['mean']),
+                'count': int(stats['count']),
+                'outliers': np.sort(outliers),
+                'n_outliers': int(state['n_outliers']),
+            },
+            'kde': smooth_kde(state['weights'], state['grid'], state['bandwidth'], stats['count']),
+        }
+
+    return {
+        'column': column,
+        'by': by,
+        'log': log,
+        'edges': edges,
+        'centers': bin_centers(edges, log=log),
+        'groups': groups,
+    }
+
+
+@st.cache_resource(show_spinner="Streaming aggregates...", max_entries=4)
+def _cached_cube(fingerprint, path):
+    return build_streaming_cube(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _cached_summary(fingerprint, path, column, by, n_bins):
+    return build_streaming_summary(path, column, _cached_cube(fingerprint, path), by=by, n_bins=n_bins)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _cached_correlations(fingerprint, path, columns):
+    engine = CorrelationEngine(columns)
+    for chunk in iter_chunks(path, columns=list(columns)):
+        engine.append(chunk)
+    return engine
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _cached_trajectories(fingerprint, path):
+    return TrajectoryEngine.from_chunks(iter_chunks(path))
+
+
+def streamed_aggregate_cube(df):
+    return _cached_cube(df.attrs['fingerprint'], df.attrs['out_of_core'])
+
+
+def streamed_distribution_summary(df, column, by='adopter', n_bins=DEFAULT_BINS):
+    return _cached_summary(df.attrs['fingerprint'], df.attrs['out_of_core'], column, by, n_bins)
+
+
+def streamed_correlation_engine(df):
+    return _cached_correlations(df.attrs['fingerprint'], df.attrs['out_of_core'], tuple(numeric_columns(df)))
+
+
+def streamed_trajectory_engine(df):
+    return _cached_trajectories(df.attrs['fingerprint'], df.attrs['out_of_core'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the dataset as row-grouped Parquet for out-of-core mode.")
+    parser.add_argument('--source', default=None, help="CSV, Parquet or Arrow file (default: the Arrow cache)")
+    parser.add_argument('--output', default=CHUNKED_PATH)
+    parser.add_argument('--row-group-rows', type=int, default=ROW_GROUP_ROWS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    output = export_chunked(args.source, args.output, args.row_group_rows)
+    metadata = pq.ParquetFile(output).metadata
+    print(f"Wrote {metadata.num_rows:,} rows in {metadata.num_row_groups} row groups to {output} "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"Run the app on it with HIGHNOTE_OUT_OF_CORE={output}")
+
+
+if __name__ == '__main__':
+    main()
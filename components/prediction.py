@@ -1,48 +1,27 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import plotly.graph_objects as go
+from components.aggregates import get_aggregate_cube, overall_stat
+from components.instrumentation import plotly_chart, traced
+from components.model_store import DEFAULT_PARAMS, FEATURES, get_model_artifact
 
+@traced
 def show_prediction_tab(df):
     st.header("Premium User Prediction Model")
     
     # Define features for the model
-    features = ['friend_cnt', 'subscriber_friend_cnt', 'songsListened', 
-                'lovedTracks', 'posts', 'playlists', 'shouts']
+    features = FEATURES
     
-    # Prepare the data
-    X = df[features]
-    y = df['adopter']
+    # Load the trained model from the model store (trains and saves it on first use)
+    artifact = get_model_artifact(df, features, DEFAULT_PARAMS)
+    model, scaler = artifact['model'], artifact['scaler']
     
-    # Create and train the model
-    @st.cache_resource
-    def train_model(X, y):
-        # Split the data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Scale the features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-        
-        # Train the model
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train_scaled, y_train)
-        
-        return model, scaler, X_test_scaled, y_test
-
-    model, scaler, X_test_scaled, y_test = train_model(X, y)
-    
-    # Model performance metrics
-    y_pred = model.predict(X_test_scaled)
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
+    # Model performance metrics, computed at training time
+    accuracy = artifact['metrics']['accuracy']
+    precision = artifact['metrics']['precision']
+    recall = artifact['metrics']['recall']
+    f1 = artifact['metrics']['f1']
     
     # Display metrics
     st.subheader("Model Performance")
@@ -56,10 +35,30 @@ def show_prediction_tab(df):
     with col4:
         st.metric("F1 Score", f"{f1:.2%}")
     
+    # Model selection results, stored with the model at training time
+    st.caption(f"Selected model: {artifact['model_name']} (ROC AUC {artifact['metrics']['roc_auc']:.3f}, "
+               f"trained {artifact['trained_at']})")
+    with st.expander("Model comparison"):
+        st.dataframe(pd.DataFrame(artifact['leaderboard']).round(4), use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            roc = artifact['curves']['roc']
+            fig = px.line(x=roc['fpr'], y=roc['tpr'], title="ROC Curve",
+                          labels={'x': 'False Positive Rate', 'y': 'True Positive Rate'})
+            fig.update_traces(line_color='#FF6B6B')
+            plotly_chart(fig, use_container_width=True)
+        with col2:
+            pr = artifact['curves']['pr']
+            fig = px.line(x=pr['recall'], y=pr['precision'], title="Precision-Recall Curve",
+                          labels={'x': 'Recall', 'y': 'Precision'})
+            fig.update_traces(line_color='#4ECDC4')
+            plotly_chart(fig, use_container_width=True)
+    
     # Feature importance
     importance_df = pd.DataFrame({
         'Feature': features,
-        'Importance': model.feature_importances_
+        'Importance': [artifact['feature_importances'][feature] for feature in features]
     }).sort_values('Importance', ascending=False)
     
     st.subheader("Feature Importance")
@@ -67,20 +66,25 @@ def show_prediction_tab(df):
                  title="Feature Importance in Prediction Model",
                  color='Importance',
                  color_continuous_scale=['#4ECDC4', '#FF6B6B'])
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
     
     # User Prediction Interface
     st.subheader("Predict Premium User Likelihood")
-    
+    show_prediction_interface(df, features, model, scaler)
+
+@st.fragment
+def show_prediction_interface(df, features, model, scaler):
+    # Editing inputs or pressing Predict only reruns this fragment
     col1, col2 = st.columns(2)
     user_input = {}
+    cube = get_aggregate_cube(df)
     
     with col1:
         for feature in features[:4]:
             user_input[feature] = st.number_input(
                 f"Enter {feature}",
                 min_value=0,
-                value=int(df[feature].mean())
+                value=int(overall_stat(cube, 'mean', feature))
             )
     
     with col2:
@@ -88,7 +92,7 @@ def show_prediction_tab(df):
             user_input[feature] = st.number_input(
                 f"Enter {feature}",
                 min_value=0,
-                value=int(df[feature].mean())
+                value=int(overall_stat(cube, 'mean', feature))
             )
     
     if st.button("Predict"):
@@ -114,11 +118,15 @@ def show_prediction_tab(df):
             }
         ))
         
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
         
         if prob_premium >= 0.7:
             st.success("This user is highly likely to become a premium subscriber!")
         elif prob_premium >= 0.4:
             st.warning("This user shows moderate potential for premium subscription.")
         else:
-            st.error("This user is less likely to become a premium subscriber.") 
\ No newline at end of file
+            st.error("This user is less likely to become a premium subscriber.")
+
+def warm_up(df):
+    # Loads (or trains and stores) the model behind the tab (see components/warmup.py)
+    get_model_artifact(df, FEATURES, DEFAULT_PARAMS)
\ No newline at end of file
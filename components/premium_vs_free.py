@@ -1,22 +1,39 @@
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
+from components.aggregates import get_aggregate_cube, segment_stat
+from components.charts import histogram_figure
+from components.instrumentation import plotly_chart, traced
+from components.sampling import group_mean_cis, is_preview
 
+ENGAGEMENT_METRICS = ['posts', 'playlists', 'shouts']
+
+@traced
 def show_premium_vs_free_tab(df):
     st.header("Premium vs Free User Comparison")
 
     # Original engagement metrics comparison
-    engagement_metrics = ['posts', 'playlists', 'shouts']
-    premium_avg = df[df['adopter'] == 1][engagement_metrics].mean()
-    free_avg = df[df['adopter'] == 0][engagement_metrics].mean()
+    engagement_metrics = ENGAGEMENT_METRICS
+    cube = get_aggregate_cube(df)
+    premium_avg = segment_stat(cube, 'adopter', 1, 'mean', engagement_metrics)
+    free_avg = segment_stat(cube, 'adopter', 0, 'mean', engagement_metrics)
+
+    # In preview mode the averages are estimates; the bars carry their 95% CI
+    error_bars = {0: None, 1: None}
+    if is_preview(df):
+        cis = group_mean_cis(df, 'adopter', engagement_metrics)
+        error_bars = {group: dict(type='data', array=cis[group].to_numpy()) if group in cis else None
+                      for group in error_bars}
 
     fig = go.Figure(data=[
-        go.Bar(name='Premium Users', x=engagement_metrics, y=premium_avg, marker_color='#FF6B6B'),
-        go.Bar(name='Free Users', x=engagement_metrics, y=free_avg, marker_color='#4ECDC4')
+        go.Bar(name='Premium Users', x=engagement_metrics, y=premium_avg, marker_color='#FF6B6B',
+               error_y=error_bars[1]),
+        go.Bar(name='Free Users', x=engagement_metrics, y=free_avg, marker_color='#4ECDC4',
+               error_y=error_bars[0])
     ])
 
-    fig.update_layout(title="Average Engagement Metrics", barmode='group')
-    st.plotly_chart(fig, use_container_width=True)
+    title = "Average Engagement Metrics" + (" (estimated, 95% CI)" if is_preview(df) else "")
+    fig.update_layout(title=title, barmode='group')
+    plotly_chart(fig, use_container_width=True)
 
     # Additional visualizations
     col1, col2 = st.columns(2)
@@ -39,13 +56,23 @@ def show_premium_vs_free_tab(df):
             line_color='#4ECDC4'
         ))
         fig.update_layout(title="Engagement Metrics Radar")
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     with col2:
-        # Distribution Plot
-        selected_metric = st.selectbox("Select metric to view distribution", engagement_metrics)
-        fig = px.histogram(df, x=selected_metric, color='adopter',
-                          color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'},
-                          marginal="box",
-                          title=f"{selected_metric} Distribution by User Type")
-        st.plotly_chart(fig, use_container_width=True) 
\ No newline at end of file
+        show_distribution_plot(df, engagement_metrics)
+
+@st.fragment
+def show_distribution_plot(df, engagement_metrics):
+    # Changing the metric only reruns this fragment
+    selected_metric = st.selectbox("Select metric to view distribution", engagement_metrics)
+    plotly_chart(distribution_figure(df, selected_metric), use_container_width=True)
+
+def distribution_figure(df, metric):
+    return histogram_figure(df, metric,
+                            title=f"{metric} Distribution by User Type",
+                            color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+
+def warm_up(df):
+    # Caches behind the tab's default view (see components/warmup.py)
+    get_aggregate_cube(df)
+    distribution_figure(df, ENGAGEMENT_METRICS[0]) 
\ No newline at end of file
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from components.data_loader import CACHE_DIR, write_atomic
+
+RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, 'responses')
+
+
+def response_key(prompt, context_fingerprint, model, temperature):
+    payload = json.dumps([prompt, context_fingerprint, model, temperature])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    # Two-level cache for assistant answers: an in-process LRU in front of one
+    # JSON file per entry on disk. Entries older than ttl_seconds are evicted.
+
+    def __init__(self, max_entries=256, ttl_seconds=7 * 24 * 3600, cache_dir=RESPONSE_CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _expired(self, entry):
+        return time.time() - entry['created_at'] > self.ttl_seconds
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self._read_disk(key)
+            if entry is not None and self._expired(entry):
+                self.entries.pop(key, None)
+                if os.path.exists(self._path(key)):
+                    os.remove(self._path(key))
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            return entry['response']
+
+    def set(self, key, response):
+        entry = {'response': response, 'created_at': time.time()}
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(entry, f)
+        write_atomic(self._path(key), write)
+
+    def _evict(self):
+        # Only the in-memory LRU is bounded; disk entries expire through the TTL
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear_expired(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            entry = self._read_disk(key)
+            if entry is None or self._expired(entry):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+
+@st.cache_resource
+def get_response_cache():
+    cache = ResponseCache()
+    cache.clear_expired()
+    return cache
@@ -0,0 +1,129 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from components.aggregates import WEIGHT_COLUMN, get_aggregate_cube
+from components.correlations import get_correlation_engine
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.trajectories import get_trajectory_engine
+
+# Approximate preview: the tabs run on a fixed-size stratified sample, so
+# interaction cost does not grow with the table. Strata cross adopter with
+# good_country; every stratum keeps at least MIN_PER_STRATUM rows so the rare
+# premium class stays represented, and rows carry `_weight` (stratum size over
+# stratum sample size) for population estimates.
+STRATA = ['adopter', 'good_country']
+PREVIEW_ROWS = int(os.getenv('HIGHNOTE_PREVIEW_ROWS', '20000'))
+MIN_PER_STRATUM = 500
+STRATUM_COLUMN = '_stratum'
+
+Z_95 = 1.959964
+
+
+def allocate(stratum_sizes, n_rows, min_per_stratum=MIN_PER_STRATUM):
+    # Proportional allocation with a floor per stratum, capped at its size
+    total = stratum_sizes.sum()
+    proportional = np.round(n_rows * stratum_sizes / total).astype(np.int64)
+    return np.minimum(np.maximum(proportional, np.minimum(stratum_sizes, min_per_stratum)), stratum_sizes)
+
+
+def stratified_sample(df, n_rows=PREVIEW_ROWS, strata=STRATA, seed=0):
+    strata = [key for key in strata if key in df.columns]
+    if len(df) <= n_rows or not strata:
+        return df
+
+    groups = df.groupby(strata, observed=True, sort=True).indices
+    positions = list(groups.values())
+    sizes = np.array([len(rows) for rows in positions])
+    allocation = allocate(sizes, n_rows)
+
+    rng = np.random.default_rng(seed)
+    chosen, weights, stratum = [], [], []
+    for index, (rows, size, take) in enumerate(zip(positions, sizes, allocation)):
+        chosen.append(np.sort(rng.choice(rows, size=take, replace=False)))
+        weights.append(np.full(take, size / take))
+        stratum.append(np.full(take, index, dtype=np.int16))
+
+    sample = df.take(np.concatenate(chosen))
+    sample[WEIGHT_COLUMN] = np.concatenate(weights)
+    sample[STRATUM_COLUMN] = np.concatenate(stratum)
+    sample.attrs = dict(df.attrs, fingerprint=f'{data_fingerprint(df)}:preview:{n_rows}',
+                        preview={'population': len(df), 'strata': strata})
+    return sample
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _cached_sample(fingerprint, n_rows, _df):
+    return stratified_sample(_df, n_rows)
+
+
+def get_preview_sample(df, n_rows=PREVIEW_ROWS):
+    # Out of core, df is already a bounded sample
+    if is_out_of_core(df):
+        return df
+    return _cached_sample(data_fingerprint(df), n_rows, df)
+
+
+def is_preview(df):
+    return 'preview' in df.attrs
+
+
+def stratified_mean(sample, column):
+    # Population mean of `column` with the half-width of its 95% CI, from the
+    # stratified estimator sum_h W_h * mean_h with finite population correction
+    if not is_preview(sample):
+        return float(sample[column].mean()), 0.0
+    values = sample[column].astype(np.float64)
+    frame = pd.DataFrame({'value': values, 'stratum': sample[STRATUM_COLUMN],
+                          'weight': sample[WEIGHT_COLUMN]})[values.notna()]
+    by_stratum = frame.groupby('stratum')
+    n = by_stratum['value'].count()
+    population = by_stratum['weight'].sum()
+    share = population / population.sum()
+    mean = float((share * by_stratum['value'].mean()).sum())
+    variance = (share ** 2 * (1 - n / population) * by_stratum['value'].var(ddof=1).fillna(0) / n).sum()
+    return mean, float(Z_95 * np.sqrt(max(variance, 0.0)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _cached_group_cis(fingerprint, by, columns, _sample):
+    # Strata nest within adopter and good_country, so each of their groups is
+    # a stratified sample of its own
+    return pd.DataFrame({
+        group: {column: stratified_mean(rows, column)[1] for column in columns}
+        for group, rows in _sample.groupby(by, observed=True, sort=True)
+    })
+
+
+def group_mean_cis(sample, by, columns):
+    # Half-widths of the 95% CIs of each group's mean (columns x groups); zero
+    # when the frame is not a preview sample
+    if not is_preview(sample):
+        groups = sorted(sample[by].dropna().unique())
+        return pd.DataFrame(0.0, index=list(columns), columns=groups)
+    return _cached_group_cis(data_fingerprint(sample), by, tuple(columns), sample)
+
+
+def _warm_exact(df):
+    # The exact versions of what the tabs read first; later lookups hit the caches
+    get_aggregate_cube(df)
+    get_correlation_engine(df)
+    get_trajectory_engine(df)
+
+
+@st.cache_resource
+def _refinement_pool():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='exact-refine')
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _refinement_job(fingerprint, _df):
+    return _refinement_pool().submit(_warm_exact, _df)
+
+
+def exact_refinement(df):
+    # Future that completes once the exact aggregates for df are cached
+    return _refinement_job(data_fingerprint(df), df)
@@ -0,0 +1,159 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from components.compiled_forest import load_compiled, predict_proba
+
+
+class MicroBatcher:
+    # Collects rows from concurrent requests and scores them together: the first
+    # request opens a batch, which closes after max_wait_ms or max_batch rows
+
+    def __init__(self, compiled, max_batch=256, max_wait_ms=2.0):
+        self.compiled = compiled
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, X):
+        # Malformed rows are rejected here, before they can join a batch
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        n_features = len(self.compiled['features'])
+        if X.ndim != 2 or X.shape[0] == 0 or X.shape[1] != n_features:
+            raise ValueError(f"expected rows of {n_features} features, got shape {X.shape}")
+        future = Future()
+        self.requests.put((X, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        n_rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _score_each(self, batch):
+        # Fallback when the batch as a whole fails: only the request that
+        # caused it gets the error
+        for X, future in batch:
+            try:
+                future.set_result(predict_proba(self.compiled, X))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                scores = predict_proba(self.compiled, np.vstack([X for X, _ in batch]))
+            except Exception:
+                self._score_each(batch)
+                continue
+
+            self.batches += 1
+            self.rows += len(scores)
+            start = 0
+            for X, future in batch:
+                future.set_result(scores[start:start + len(X)])
+                start += len(X)
+
+
+def _parse_rows(payload, features):
+    # Accepts {"features": {...}} for one user or {"instances": [{...}, ...]}
+    instances = payload['instances'] if 'instances' in payload else [payload['features']]
+    if not isinstance(instances, list) or not instances:
+        raise ValueError("instances must be a non-empty list")
+    return [[float(instance[feature]) for feature in features] for instance in instances]
+
+
+def make_handler(batcher, timeout=5.0):
+    features = [str(f) for f in batcher.compiled['features']]
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'features': features,
+                                 'batches': batcher.batches, 'rows': batcher.rows})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                rows = _parse_rows(json.loads(self.rfile.read(length)), features)
+                future = batcher.submit(rows)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {'error': f"invalid request: {e}"})
+                return
+
+            try:
+                scores = future.result(timeout=timeout)
+            except FutureTimeoutError:  # not the builtin before Python 3.11
+                self._send(503, {'error': "scoring timed out"})
+                return
+            except Exception as e:
+                self._send(500, {'error': f"scoring failed: {e}"})
+                return
+            self._send(200, {'probabilities': scores.tolist()})
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate latency
+            pass
+
+    return ScoringHandler
+
+
+def serve(compiled, host='127.0.0.1', port=8502, max_batch=256, max_wait_ms=2.0):
+    batcher = MicroBatcher(compiled, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve premium propensity scores over HTTP.")
+    parser.add_argument('model', help="Compiled forest (.npz) from components.compiled_forest")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    server = serve(load_compiled(args.model), args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(f"Scoring service on http://{args.host}:{args.port}/score")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+
+import numpy as np
+import streamlit as st
+
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.instrumentation import tracked_cache
+
+# Segment dimensions for the global filter: column -> (label, buckets), each
+# bucket matching lo <= value < hi
+SEGMENT_DIMENSIONS = {
+    'good_country': ("Country", [("US, UK or Germany", 1, 2), ("Other countries", 0, 1)]),
+    'male': ("Gender", [("Male", 1, 2), ("Female", 0, 1)]),
+    'age': ("Age", [("Under 25", 0, 25), ("25-34", 25, 35), ("35-49", 35, 50),
+                    ("50-64", 50, 65), ("65+", 65, np.inf)]),
+    'tenure': ("Tenure (months)", [("Under 12", 0, 12), ("12-35", 12, 36), ("36-71", 36, 72),
+                                   ("72+", 72, np.inf)]),
+    'friend_cnt': ("Friends", [("None", 0, 1), ("1-4", 1, 5), ("5-19", 5, 20), ("20-49", 20, 50),
+                               ("50+", 50, np.inf)]),
+}
+
+# Set bits per byte value, for counting rows without unpacking a bitmap
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class SegmentIndex:
+    # One packed bitmap (one bit per row) per bucket of every dimension.
+    # Buckets of a dimension are OR-ed, dimensions AND-ed, so any segment is a
+    # few bitwise operations over n/8 bytes instead of boolean masks of the frame.
+
+    def __init__(self, n_rows, bitmaps):
+        self.n_rows = n_rows
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def build(cls, df, dimensions=SEGMENT_DIMENSIONS):
+        bitmaps = {}
+        for column, (_, buckets) in dimensions.items():
+            if column not in df.columns:
+                continue
+            values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            for label, lo, hi in buckets:
+                bitmaps[column, label] = np.packbits((values >= lo) & (values < hi))
+        return cls(len(df), bitmaps)
+
+    def select(self, selection):
+        # None means "all rows"
+        selected = None
+        for column, labels in selection.items():
+            if not labels:
+                continue
+            bits = np.bitwise_or.reduce([self.bitmaps[column, label] for label in labels])
+            selected = bits if selected is None else selected & bits
+        return selected
+
+    def count(self, bits):
+        return self.n_rows if bits is None else int(POPCOUNT[bits].sum(dtype=np.int64))
+
+    def rows(self, bits):
+        if bits is None:
+            return np.arange(self.n_rows)
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+
+def normalize_selection(selection):
+    return {column: sorted(labels) for column, labels in sorted(selection.items()) if labels}
+
+
+def segment_key(selection):
+    selection = normalize_selection(selection)
+    if not selection:
+        return 'all'
+    return hashlib.sha256(json.dumps(selection).encode()).hexdigest()[:12]
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _cached_index(fingerprint, _df):
+    return SegmentIndex.build(_df)
+
+
+def get_segment_index(df):
+    return _cached_index(data_fingerprint(df), df)
+
+
+@tracked_cache('segment', st.cache_resource(show_spinner=False, max_entries=64))
+def _cached_segment(fingerprint, key, selection_json, _df):
+    index = get_segment_index(_df)
+    segment = _df.take(index.rows(index.select(json.loads(selection_json))))
+    # A fingerprint of its own, so the cube, distributions, correlations and
+    # chat context are cached per segment like any other dataset version
+    segment.attrs = dict(_df.attrs, fingerprint=f'{fingerprint}:{key}', segment=json.loads(selection_json))
+    return segment
+
+
+def filter_frame(df, selection):
+    selection = normalize_selection(selection)
+    if not selection:
+        return df
+    return _cached_segment(data_fingerprint(df), segment_key(selection), json.dumps(selection), df)
+
+
+def show_segment_filter(df):
+    # Sidebar filter shared by every tab; returns the selected rows of df
+    st.sidebar.header("Segment")
+    if is_out_of_core(df):
+        st.sidebar.caption("Segment filtering is not available in out-of-core mode.")
+        return df
+    index = get_segment_index(df)
+    selection = {}
+    for column, (label, buckets) in SEGMENT_DIMENSIONS.items():
+        if column not in df.columns:
+            continue
+        counts = {name: index.count(index.bitmaps[column, name]) for name, _, _ in buckets}
+        selection[column] = st.sidebar.multiselect(
+            label, list(counts), key=f"segment_{column}",
+            format_func=lambda name, counts=counts: f"{name} ({counts[name]:,})")
+
+    selected = index.count(index.select(selection))
+    st.sidebar.caption(f"{selected:,} of {index.n_rows:,} users selected")
+    return filter_frame(df, selection)
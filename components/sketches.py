@@ -0,0 +1,109 @@
+import numpy as np
+
+DIGEST_COMPRESSION = 200
+
+
+class TDigest:
+    # Mergeable quantile sketch (merging t-digest with the k1 scale function).
+    # Centroids near the tails stay small, so extreme quantiles are accurate,
+    # and the size stays around `compression` centroids however many values
+    # are added. Digests built on separate chunks merge into one. While there
+    # are at most `compression` distinct values (flags, ages, small counts) the
+    # digest is an exact weighted histogram and quantiles match np.quantile.
+    # Past that, tied values are merged before clustering and a value heavy
+    # enough to fill a centroid on its own stays a centroid of that one value,
+    # so quantiles falling in the tie (e.g. the quartiles of a skewed count
+    # column) are the observed value rather than a blend of its neighbours.
+
+    def __init__(self, compression=DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        # Centroids holding a single distinct value
+        self.single = np.empty(0, dtype=bool)
+        self.min = np.inf
+        self.max = -np.inf
+        self.exact = True
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]),
+                       np.concatenate([self.single, np.ones(len(values), dtype=bool)]))
+        return self
+
+    def merge(self, other):
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.exact = self.exact and other.exact
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]),
+                           np.concatenate([self.single, other.single]))
+        return self
+
+    def _compress(self, means, weights, single):
+        # Equal values merge first; the result holds one value only if every
+        # part did
+        means, inverse = np.unique(means, return_inverse=True)
+        inverse = inverse.ravel()
+        weights = np.bincount(inverse, weights=weights)
+        single = np.bincount(inverse, weights=~single) == 0
+        if self.exact:
+            if len(means) <= self.compression:
+                self.means, self.weights, self.single = means, weights, single
+                return
+            self.exact = False
+
+        total = weights.sum()
+        upper = np.cumsum(weights) / total
+        lower = upper - weights / total
+
+        # Points whose quantile midpoints fall in the same unit of the k1 scale
+        # k(q) = compression / pi * asin(2q - 1) become one centroid; a point
+        # spanning a whole unit by itself is kept apart from its neighbours
+        k = self._scale((lower + upper) / 2)
+        heavy = self._scale(upper) - self._scale(lower) >= 1
+        breaks = np.diff(np.floor(k - k[0])) != 0
+        breaks |= heavy[1:] | heavy[:-1]
+        starts = np.concatenate([[0], np.flatnonzero(breaks) + 1])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        sizes = np.diff(np.append(starts, len(means)))
+        self.single = (sizes == 1) & single[starts]
+
+    def _scale(self, q):
+        return self.compression / np.pi * np.arcsin(np.clip(2 * q - 1, -1, 1))
+
+    def quantile(self, q):
+        q = np.asarray(q, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(q.shape, np.nan)
+        total = self.weights.sum()
+        if self.exact:
+            # Linear interpolation between order statistics, as np.quantile
+            cumulative = np.cumsum(self.weights)
+            position = q * (total - 1)
+            lower = self.means[np.searchsorted(cumulative, np.floor(position), side='right')]
+            upper = self.means[np.searchsorted(cumulative, np.ceil(position), side='right')]
+            return lower + (upper - lower) * (position - np.floor(position))
+        # Mixed centroids sit at their centre; single-value centroids cover
+        # their whole span, so a quantile inside a tie is that value
+        upper = np.cumsum(self.weights)
+        lower = upper - self.weights
+        centers = upper - self.weights / 2
+        starts = np.where(self.single, lower, centers)
+        ends = np.where(self.single, upper, centers)
+        positions = np.concatenate([[0.0], np.column_stack([starts, ends]).ravel(), [total]])
+        values = np.concatenate([[self.min], np.repeat(self.means, 2), [self.max]])
+        return np.interp(q * total, positions, values)
@@ -0,0 +1,199 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from components.aggregates import WEIGHT_COLUMN
+from components.data_loader import data_fingerprint, is_out_of_core
+from components.instrumentation import tracked_cache
+
+# Snapshot periods present in the data: delta1_<metric> before the current
+# snapshot, delta2_<metric> after it
+PERIODS = {'Pre': 'delta1_{}', 'Current': '{}', 'Post': 'delta2_{}'}
+
+# Segments every trajectory is split by, next to all users
+TRAJECTORY_SEGMENTS = ['good_country', 'male']
+
+# Two-sided 95% normal quantile for the confidence intervals
+Z_95 = 1.959964
+
+STAT_INDEX = ['segment_by', 'segment', 'adopter', 'metric', 'period']
+ADOPTER_GROUPS = [0, 1]
+
+
+def trajectory_metrics(columns):
+    columns = [str(column) for column in columns]
+    present = set(columns)
+    return [
+        column[len('delta1_'):] for column in columns
+        if column.startswith('delta1_')
+        and column[len('delta1_'):] in present and f"delta2_{column[len('delta1_'):]}" in present
+    ]
+
+
+def _period_stats(df, period, columns, segment_by):
+    # count, total weight, weighted sum and weighted sum of squares of every
+    # metric for every (segment, adopter) group, from one groupby per segment
+    # dimension over all metrics at once. Rows weigh 1 unless the frame is a
+    # weighted preview sample (see components.sampling)
+    values = df[list(columns.values())].astype(np.float64)
+    values.columns = list(columns)
+    row_weights = df[WEIGHT_COLUMN].astype(np.float64) if WEIGHT_COLUMN in df.columns else None
+    if row_weights is None:
+        weighted, squares = values, np.square(values)
+        present = values.notna().astype(np.float64)
+    else:
+        weighted = values.mul(row_weights, axis=0)
+        squares = np.square(values).mul(row_weights, axis=0)
+        present = values.notna().mul(row_weights, axis=0)
+    both = pd.concat([values, weighted.add_suffix('__w'), squares.add_suffix('__sq'),
+                      present.add_suffix('__n')], axis=1)
+
+    tables = []
+    for by in [None] + list(segment_by):
+        keys = [df['adopter']] + ([df[by]] if by else [])
+        grouped = both.groupby(keys, observed=True)
+        counts = grouped[list(columns)].count().stack()
+        sums = {}
+        for name, suffix in [('weight', '__n'), ('sum', '__w'), ('sum_sq', '__sq')]:
+            total = grouped[[column + suffix for column in columns]].sum()
+            total.columns = list(columns)
+            sums[name] = total.stack()
+
+        table = pd.DataFrame({'n': counts, **sums}).reset_index()
+        if by:
+            table.columns = ['adopter', 'segment', 'metric', 'n', 'weight', 'sum', 'sum_sq']
+            table['segment'] = table['segment'].astype(str)
+        else:
+            table.columns = ['adopter', 'metric', 'n', 'weight', 'sum', 'sum_sq']
+            table['segment'] = 'all'
+        table['segment_by'] = by or 'all'
+        tables.append(table)
+
+    stats = pd.concat(tables, ignore_index=True)
+    stats['period'] = period
+    stats['adopter'] = stats['adopter'].astype(int)
+    return stats.set_index(STAT_INDEX)
+
+
+def _by_adopter(table):
+    # One column block per adopter group. A group missing from the data (a
+    # segment without premium users) comes through as NaN instead of absent
+    table = table.unstack('adopter')
+    return table.reindex(columns=pd.MultiIndex.from_product(
+        [table.columns.unique(level=0), ADOPTER_GROUPS], names=table.columns.names))
+
+
+class TrajectoryEngine:
+    # Per-period sufficient statistics (count, weight, sum, sum of squares) for every
+    # metric, adopter group and segment. Means, confidence intervals and lift
+    # are derived from them, and add_period() only scans the new snapshot, so
+    # monthly snapshots can be appended without recomputing earlier periods.
+
+    def __init__(self, metrics, segment_by=TRAJECTORY_SEGMENTS):
+        self.metrics = list(metrics)
+        self.segment_by = list(segment_by)
+        self.periods = []
+        self.stats = None
+        self.summary = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_columns(cls, columns, segment_by=TRAJECTORY_SEGMENTS):
+        segment_by = [by for by in segment_by if by in columns]
+        # Segment columns (good_country has deltas too) are not trajectories
+        return cls([m for m in trajectory_metrics(columns) if m not in segment_by], segment_by)
+
+    def period_columns(self, period):
+        return {metric: PERIODS[period].format(metric) for metric in self.metrics}
+
+    @classmethod
+    def from_frame(cls, df, segment_by=TRAJECTORY_SEGMENTS):
+        engine = cls.for_columns(df.columns, segment_by)
+        for period in PERIODS:
+            engine.add_period(period, df, engine.period_columns(period))
+        return engine
+
+    @classmethod
+    def from_chunks(cls, chunks, segment_by=TRAJECTORY_SEGMENTS):
+        # Same result as from_frame, summing each chunk's statistics
+        engine, stats = None, {}
+        for chunk in chunks:
+            if engine is None:
+                engine = cls.for_columns(chunk.columns, segment_by)
+            for period in PERIODS:
+                part = _period_stats(chunk, period, engine.period_columns(period), engine.segment_by)
+                stats[period] = part if period not in stats else stats[period].add(part, fill_value=0)
+        for period in PERIODS:
+            engine._add_stats(period, stats[period])
+        return engine
+
+    def add_period(self, period, df, columns=None):
+        # `df` holds one row per user with the period's metric values (named
+        # as in `columns`, metric -> column) plus adopter and segment columns
+        if period in self.periods:
+            raise ValueError(f"Period {period} already exists")
+        columns = columns or {metric: metric for metric in self.metrics if metric in df.columns}
+        self._add_stats(period, _period_stats(df, period, columns, self.segment_by))
+
+    def _add_stats(self, period, stats):
+        with self.lock:
+            self.stats = stats if self.stats is None else pd.concat([self.stats, stats])
+            self.periods.append(period)
+            self.summary = None
+
+    def table(self):
+        # Mean, standard deviation and 95% CI of every (segment, adopter, metric, period)
+        with self.lock:
+            if self.summary is None:
+                stats = self.stats
+                # Weighted moments (weight == n for unweighted rows), with the
+                # sample count setting the width of the interval
+                n = stats['n']
+                mean = stats['sum'] / stats['weight']
+                variance = ((stats['sum_sq'] / stats['weight'] - mean ** 2) * n / (n - 1)).clip(lower=0)
+                half_width = Z_95 * np.sqrt(variance / n)
+                self.summary = pd.DataFrame({
+                    'n': n, 'mean': mean, 'std': np.sqrt(variance),
+                    'ci_low': mean - half_width, 'ci_high': mean + half_width,
+                })
+            return self.summary
+
+    def trajectory(self, metric, segment_by='all', segment='all'):
+        # Rows per period (in snapshot order), one column block per adopter group
+        table = self.table().xs((segment_by, str(segment), metric),
+                                level=['segment_by', 'segment', 'metric'])
+        return _by_adopter(table).reindex(self.periods)
+
+    def lift(self, metric):
+        # Premium mean relative to free, per segment and period, with a CI from
+        # the delta method on the ratio of the two independent means
+        table = _by_adopter(self.table().xs(metric, level='metric'))
+        premium = table.xs(1, axis=1, level='adopter')
+        free = table.xs(0, axis=1, level='adopter')
+        ratio = premium['mean'] / free['mean']
+        se_premium = (premium['ci_high'] - premium['mean']) / Z_95
+        se_free = (free['ci_high'] - free['mean']) / Z_95
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_se = np.abs(ratio) * np.sqrt((se_premium / premium['mean']) ** 2
+                                                  + (se_free / free['mean']) ** 2)
+        lift = pd.DataFrame({
+            'lift': ratio - 1,
+            'ci_low': ratio - 1 - Z_95 * relative_se,
+            'ci_high': ratio - 1 + Z_95 * relative_se,
+        }).replace([np.inf, -np.inf], np.nan)
+        return lift.reindex(self.periods, level='period')
+
+
+@tracked_cache('trajectory_engine', st.cache_resource(show_spinner=False, max_entries=16))
+def _cached_engine(fingerprint, _df):
+    return TrajectoryEngine.from_frame(_df)
+
+
+def get_trajectory_engine(df):
+    # Switching metrics in the usage tab is a lookup into this engine
+    if is_out_of_core(df):
+        from components.out_of_core import streamed_trajectory_engine
+        return streamed_trajectory_engine(df)
+    return _cached_engine(data_fingerprint(df), df)
@@ -1,58 +1,87 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from components.charts import histogram_figure
+from components.correlations import get_correlation_engine
+from components.instrumentation import plotly_chart, traced
+from components.sampling import is_preview
+from components.trajectories import get_trajectory_engine
 
+TIME_METRICS = ['songsListened', 'lovedTracks', 'playlists']
+CORRELATION_METRICS = TIME_METRICS + ['posts', 'shouts']
+
+@traced
 def show_usage_patterns_tab(df):
     st.header("Usage Pattern Analysis")
 
     # Original time series analysis
-    time_metrics = ['songsListened', 'lovedTracks', 'playlists']
-    selected_metric = st.selectbox("Select Usage Metric", time_metrics)
+    time_metrics = TIME_METRICS
+    show_metric_analysis(df, time_metrics)
+
+@st.fragment
+def show_metric_analysis(df, time_metrics):
+    # Changing the metric only reruns this fragment, and every trajectory is
+    # precomputed by the trajectory engine, so it is a lookup
+    engine = get_trajectory_engine(df)
+    metrics = time_metrics + [m for m in engine.metrics if m not in time_metrics]
+    selected_metric = st.selectbox("Select Usage Metric", metrics)
 
     fig = go.Figure()
+    trajectory = engine.trajectory(selected_metric)
 
     for adopter, name, color in [(1, 'Premium Users', '#FF6B6B'), (0, 'Free Users', '#4ECDC4')]:
-        user_group = df[df['adopter'] == adopter]
-        values = [
-            user_group[f'delta1_{selected_metric}'].mean(),
-            user_group[selected_metric].mean(),
-            user_group[f'delta2_{selected_metric}'].mean()
-        ]
+        values = trajectory['mean'][adopter]
 
         fig.add_trace(go.Scatter(
-            x=['Pre', 'Current', 'Post'],
+            x=list(trajectory.index),
             y=values,
             name=name,
-            line=dict(color=color)
+            line=dict(color=color),
+            error_y=dict(type='data', symmetric=False,
+                         array=trajectory['ci_high'][adopter] - values,
+                         arrayminus=values - trajectory['ci_low'][adopter])
         ))
 
     fig.update_layout(
         title=f"{selected_metric} Evolution Over Time",
         xaxis_title="Time Period",
-        yaxis_title="Average Value",
+        yaxis_title="Average Value (95% CI)",
         height=400
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
+
+    # Premium lift over free users per segment
+    lift = engine.lift(selected_metric)
+    lift_table = (lift['lift'] * 100).unstack('period')[engine.periods].round(1)
+    lift_table.index = [f"{by}={segment}" if by != 'all' else 'All users' for by, segment in lift_table.index]
+    st.caption("Premium lift over free users (%) by segment and period"
+               + (" (approximate, from the preview sample)" if is_preview(df) else ""))
+    st.dataframe(lift_table, use_container_width=True)
 
     # Additional usage pattern visualizations
     col1, col2 = st.columns(2)
 
     with col1:
         # Distribution comparison
-        fig = px.histogram(df, x=selected_metric,
-                          color='adopter',
-                          marginal="box",
-                          title=f"{selected_metric} Distribution",
-                          color_discrete_map={0: '#4ECDC4', 1: '#FF6B6B'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(distribution_figure(df, selected_metric), use_container_width=True)
 
     with col2:
         # Correlation heatmap
-        correlation_metrics = time_metrics + ['posts', 'shouts']
-        corr_matrix = df[correlation_metrics].corr()
+        corr_matrix = get_correlation_engine(df).matrix(CORRELATION_METRICS)
         fig = px.imshow(corr_matrix,
                        labels=dict(color="Correlation"),
                        color_continuous_scale="RdBu",
                        title="Usage Metrics Correlation")
-        st.plotly_chart(fig, use_container_width=True) 
\ No newline at end of file
+        plotly_chart(fig, use_container_width=True)
+
+def distribution_figure(df, metric):
+    return histogram_figure(df, metric,
+                            title=f"{metric} Distribution",
+                            color_map={0: '#4ECDC4', 1: '#FF6B6B'})
+
+def warm_up(df):
+    # Caches behind the tab's default view (see components/warmup.py)
+    get_trajectory_engine(df)
+    get_correlation_engine(df).matrix(CORRELATION_METRICS)
+    distribution_figure(df, TIME_METRICS[0])
\ No newline at end of file
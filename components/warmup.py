@@ -0,0 +1,49 @@
+import importlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from components.data_loader import data_fingerprint
+from components.instrumentation import span
+
+# Optional warm-up (HIGHNOTE_WARMUP=1): as soon as the server process has the
+# data, each tab's warm_up(df) runs in a thread pool, filling the shared caches
+# (aggregate cube, distributions, engines, chat context, model) and building
+# the tab's default figures, so visitors find every tab ready. This imports all
+# tab modules, sklearn included; without warm-up they load on first use.
+WARMUP = os.getenv('HIGHNOTE_WARMUP') == '1'
+WARMUP_WORKERS = int(os.getenv('HIGHNOTE_WARMUP_WORKERS', '4'))
+
+# Tab modules in the order the dashboard shows them
+TAB_MODULES = ['premium_vs_free', 'geography', 'usage_patterns', 'core_metrics', 'prediction', 'chat_analysis']
+
+
+def warm_tab(module, df):
+    with span(f'warm_up:{module}'):
+        importlib.import_module(f'components.{module}').warm_up(df)
+
+
+@st.cache_resource
+def _warmup_pool():
+    return ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix='warm-up')
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _warmup_jobs(fingerprint, _df):
+    pool = _warmup_pool()
+    return {module: pool.submit(warm_tab, module, _df) for module in TAB_MODULES}
+
+
+def start_warmup(df):
+    # Once per dataset version and process; returns {tab module: Future}
+    return _warmup_jobs(data_fingerprint(df), df)
+
+
+if __name__ == '__main__':
+    # Fills the on-disk caches (published cube, chat context, model store)
+    # ahead of a deploy, so a fresh server only has to map them
+    from components.data_loader import load_dataset
+    for module, job in start_warmup(load_dataset()[0]).items():
+        job.result()
+        print(f"Warmed {module}")
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Caches (Arrow files, models, chat context) go to a scratch directory, not
+# the repo; set before any component reads it at import time
+os.environ['HIGHNOTE_CACHE_DIR'] = tempfile.mkdtemp(prefix='highnote-tests-')
+os.environ.pop('HIGHNOTE_MODEL_DIR', None)
+
+
+@pytest.fixture(scope='session')
+def users():
+    from tools.synthetic_data import generate_users
+    return generate_users(3000, seed=1)
+
+
+@pytest.fixture(scope='session')
+def artifact(users):
+    # A small forest in the prediction tab's artifact layout, without the
+    # cross-validated model selection
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from components.model_store import FEATURES
+
+    scaler = StandardScaler().fit(users[FEATURES])
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0)
+    model.fit(scaler.transform(users[FEATURES]), users['adopter'])
+    return {'model': model, 'scaler': scaler, 'features': FEATURES, 'key': 'test'}
+
+
+@pytest.fixture(scope='session')
+def loaded(users, tmp_path_factory):
+    # The synthetic users loaded like the dashboard's dataset: Arrow cache,
+    # fingerprint and shared-memory attrs
+    from components.data_loader import load_dataset
+
+    directory = tmp_path_factory.mktemp('loaded')
+    source = directory / 'users.parquet'
+    users.to_parquet(source)
+    return load_dataset(str(source), os.path.join(REPO_ROOT, 'High Note data dictionary.xlsx'),
+                        str(directory / 'cache'))
@@ -0,0 +1,26 @@
+import json
+
+import components.model_store as model_store
+from components.analysis_tools import run_tool
+
+
+def test_feature_importances_use_the_full_frame(users, monkeypatch):
+    frames = []
+
+    def fake_artifact(df):
+        frames.append(df)
+        return {'model_name': 'fake', 'metrics': {'auc': 0.5}, 'feature_importances': {'posts': 1.0}}
+
+    monkeypatch.setattr(model_store, 'get_model_artifact', fake_artifact)
+    segment = users[users['male'] == 1]
+    result = json.loads(run_tool(segment, 'feature_importances', {}, model_df=users))
+
+    assert result['model'] == 'fake'
+    assert frames == [users]
+
+
+def test_other_tools_use_the_segment(users):
+    segment = users[users['male'] == 1]
+    result = json.loads(run_tool(segment, 'group_aggregates', {'by': 'adopter', 'columns': ['age']},
+                                 model_df=users))
+    assert result['group_sizes']['1'] == segment['adopter'].sum() != users['adopter'].sum()
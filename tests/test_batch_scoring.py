@@ -0,0 +1,47 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from components.batch_scoring import score_file, score_frame
+
+
+def test_free_only_skips_adopter_chunks(artifact, users, tmp_path):
+    # Adopters first, so the first chunks hold no free users at all
+    ordered = users.sort_values('adopter', ascending=False, kind='stable')
+    source = tmp_path / 'users.parquet'
+    ordered.to_parquet(source)
+    n_free = int((users['adopter'] == 0).sum())
+
+    summary = score_file(str(source), str(tmp_path / 'scores.parquet'), artifact,
+                         only_free=True, workers=1, chunk_rows=100)
+    scores = pd.read_parquet(tmp_path / 'scores.parquet')
+    assert summary['rows'] == n_free
+    assert set(scores['net_user']) == set(users.loc[users['adopter'] == 0, 'net_user'])
+
+
+def test_score_frame_all_adopters(artifact, users):
+    result = score_frame(users[users['adopter'] == 1], artifact, only_free=True)
+    assert result.empty
+    assert list(result.columns) == ['net_user', 'propensity', 'propensity_rank', 'propensity_percentile']
+
+
+def test_workers_get_an_unregistered_artifact(artifact, users, tmp_path):
+    # The conftest artifact was never saved to the model registry
+    source = tmp_path / 'users.parquet'
+    users.to_parquet(source)
+    output = tmp_path / 'scores.parquet'
+
+    summary = score_file(str(source), str(output), artifact, workers=2, chunk_rows=500)
+    scores = pd.read_parquet(output)
+    assert summary['rows'] == len(users)
+    expected = score_frame(users, artifact).set_index('net_user')['propensity']
+    pd.testing.assert_series_equal(scores.set_index('net_user')['propensity'], expected.loc[scores['net_user']])
+
+
+def test_rank_columns_are_marked_approximate(artifact, users, tmp_path):
+    source = tmp_path / 'users.parquet'
+    users.to_parquet(source)
+    output = tmp_path / 'scores.parquet'
+    score_file(str(source), str(output), artifact, workers=1)
+    schema = pq.read_schema(output)
+    for name in ['propensity_rank', 'propensity_percentile']:
+        assert b'Approximate' in schema.field(name).metadata[b'description']
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from components.chat_analysis import MAX_TOOL_ROUNDS, astream_analysis_response, stream_analysis_response
+from components.response_cache import ResponseCache
+from tools import fake_openai_server
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    server = fake_openai_server.serve(port=0, token_delay=0.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/v1'
+    server.shutdown()
+    server.server_close()
+
+
+def _sync_answer(base_url, df, prompt, cache):
+    client = OpenAI(base_url=base_url, api_key='test', max_retries=0)
+    return list(stream_analysis_response(client, df, prompt, cache=cache))
+
+
+def _async_answer(base_url, df, prompt, cache):
+    async def collect():
+        client = AsyncOpenAI(base_url=base_url, api_key='test', max_retries=0)
+        return [part async for part in astream_analysis_response(client, df, prompt, cache=cache)]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize('answer', [_sync_answer, _async_answer], ids=['sync', 'async'])
+def test_streams_answer_after_tool_round(base_url, users, tmp_path, answer):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    parts = answer(base_url, users, 'Who converts?', cache)
+
+    # Streamed word by word, after the canned group_aggregates call was run
+    assert len(parts) > 1
+    text = ''.join(parts)
+    assert 'Stand-in answer for: Who converts?' in text
+    assert 'Tool results: 1 ' in text
+    assert 'Error' not in text
+
+    # The second ask is served from the cache in one piece
+    assert answer(base_url, users, 'Who converts?', cache) == [text]
+    assert cache.stats()['hits'] == 1
+
+
+def test_sync_and_async_agree(base_url, users, tmp_path):
+    sync = ''.join(_sync_answer(base_url, users, 'Same question', ResponseCache(cache_dir=str(tmp_path / 'a'))))
+    asynchronous = ''.join(_async_answer(base_url, users, 'Same question',
+                                         ResponseCache(cache_dir=str(tmp_path / 'b'))))
+    assert sync == asynchronous
+
+
+@pytest.mark.parametrize('answer', [_sync_answer, _async_answer], ids=['sync', 'async'])
+def test_errors_are_reported_not_cached(users, tmp_path, answer):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    parts = answer('http://127.0.0.1:9/v1', users, 'Unreachable', cache)
+    assert parts[-1].startswith('Error generating response')
+    assert cache.stats()['hits'] == 0 and not list(tmp_path.iterdir())
+
+
+def test_last_round_forbids_tools(base_url, users, tmp_path, monkeypatch):
+    # A server that always calls a tool still ends with an answer
+    monkeypatch.setattr(fake_openai_server, 'wants_tool_call',
+                        lambda request: request.get('tool_choice') != 'none')
+    text = ''.join(_sync_answer(base_url, users, 'Keep calling', ResponseCache(cache_dir=str(tmp_path))))
+    assert f'Tool results: {MAX_TOOL_ROUNDS} ' in text
+
+
+def test_cache_key_follows_the_data(users):
+    from components.chat_analysis import prepare_request
+
+    # Same headline numbers, different rows behind the tools
+    changed = users.copy()
+    changed['posts'] = changed['posts'] + 1
+    messages, key = prepare_request(users, 'Who converts?')
+    changed_messages, changed_key = prepare_request(changed, 'Who converts?')
+    assert messages == changed_messages
+    assert key != changed_key
+
+    segment = users[users['male'] == 1]
+    assert prepare_request(segment, 'Who converts?', users)[1] != prepare_request(segment, 'Who converts?')[1]
+
+
+class _EmptyStream:
+    # A client whose completions stream no content at all
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                return iter([])
+
+
+def test_empty_answers_are_not_cached(users, tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    assert list(stream_analysis_response(_EmptyStream, users, 'Anything?', cache=cache)) == []
+    assert not cache.entries and not list(tmp_path.iterdir())
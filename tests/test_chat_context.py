@@ -0,0 +1,24 @@
+import os
+
+from components.chat_context import CONTEXT_DIR, get_numeric_data_context
+from components.segments import filter_frame
+
+
+def _context_files():
+    return set(os.listdir(CONTEXT_DIR)) if os.path.isdir(CONTEXT_DIR) else set()
+
+
+def test_whole_dataset_context_is_kept_on_disk(loaded):
+    df, _ = loaded
+    context = get_numeric_data_context(df)
+    assert f"{context['fingerprint']}.json" in _context_files()
+    assert set(context) == {'fingerprint', 'key_metrics', 'stats'}
+
+
+def test_segment_contexts_stay_in_memory(loaded):
+    df, _ = loaded
+    before = _context_files()
+    for labels in (["Male"], ["Female"]):
+        segment = filter_frame(df, {'male': labels})
+        assert get_numeric_data_context(segment)['key_metrics']['total_users'] == len(segment)
+    assert _context_files() == before
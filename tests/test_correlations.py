@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.aggregates import numeric_columns
+from components.correlations import CorrelationEngine
+
+
+@pytest.fixture(scope='module')
+def frame(users):
+    df = users.copy()
+    # Some NaNs, to exercise the pairwise handling
+    df.loc[df.index[::7], 'avg_friend_age'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_matches_pandas(frame, method):
+    # Spearman ranks each column once, which equals pandas' per-pair ranks
+    # only without NaNs
+    df = frame if method == 'pearson' else frame.dropna(axis=1)
+    columns = numeric_columns(df)
+    engine = CorrelationEngine.from_frame(df)
+    expected = df[columns].corr(method=method)
+    result = engine.matrix(method=method, df=df)
+    pd.testing.assert_frame_equal(result, expected, atol=1e-9, check_names=False)
+
+
+def test_keeps_only_statistics(frame):
+    engine = CorrelationEngine.from_frame(frame)
+    engine.matrix(method='spearman', df=frame)
+    retained = sum(value.nbytes for value in vars(engine).values() if isinstance(value, np.ndarray))
+    retained += sum(matrix.memory_usage().sum() for matrix in engine.matrices.values())
+    assert retained < frame.memory_usage().sum() / 10
+
+
+def test_append_matches_one_pass(frame):
+    half = len(frame) // 2
+    engine = CorrelationEngine.from_frame(frame.iloc[:half])
+    engine.append(frame.iloc[half:])
+    np.testing.assert_allclose(engine.matrix().to_numpy(),
+                               CorrelationEngine.from_frame(frame).matrix().to_numpy(), atol=1e-9)
+
+
+def test_spearman_needs_the_frame(frame):
+    with pytest.raises(ValueError):
+        CorrelationEngine.from_frame(frame).matrix(method='spearman')
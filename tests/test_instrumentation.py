@@ -0,0 +1,12 @@
+import sys
+
+from components.instrumentation import begin_run, end_run
+
+
+def test_unfinished_run_does_not_leave_profiler_running():
+    # A profiled run that stopped early (st.stop, st.rerun, an exception) never
+    # reached end_run; the next run switches its profiler off
+    begin_run(profile=True)
+    run = begin_run()
+    assert sys.getprofile() is None
+    assert end_run() is run and run['profile'] is None
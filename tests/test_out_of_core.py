@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from components.aggregates import QUANTILES, build_aggregate_cube
+from components.distributions import summarize_distribution
+from components.out_of_core import build_streaming_cube, build_streaming_summary
+from components.sketches import TDigest
+
+CHUNK_ROWS = 3000
+# Quantile error allowed, relative to the column's standard deviation
+QUANTILE_TOLERANCE = 0.02
+
+
+@pytest.fixture(scope='module')
+def population():
+    from tools.synthetic_data import generate_users
+    return generate_users(40000, seed=4)
+
+
+@pytest.fixture(scope='module')
+def source(population, tmp_path_factory):
+    path = tmp_path_factory.mktemp('out_of_core') / 'users.parquet'
+    population.to_parquet(path, row_group_size=10000)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def cubes(population, source):
+    return build_aggregate_cube(population), build_streaming_cube(source, chunk_rows=CHUNK_ROWS)
+
+
+def test_cube_moments_match(cubes):
+    exact, streamed = cubes
+    assert set(streamed) == set(exact)
+    for key in exact:
+        for stat in ['count', 'mean', 'std', 'min', 'max']:
+            np.testing.assert_allclose(streamed[key].xs(stat, axis=1, level=1).to_numpy(dtype=float),
+                                       exact[key].xs(stat, axis=1, level=1).to_numpy(dtype=float),
+                                       rtol=1e-9, atol=1e-9, err_msg=f'{key} {stat}')
+
+
+def test_cube_quantiles_match(cubes):
+    exact, streamed = cubes
+    std = exact['all'].xs('std', axis=1, level=1).iloc[0]
+    for key in exact:
+        for name in QUANTILES.values():
+            error = (streamed[key].xs(name, axis=1, level=1) - exact[key].xs(name, axis=1, level=1)).abs()
+            relative = (error / std).max().max()
+            assert relative < QUANTILE_TOLERANCE, f'{key} {name}: {relative:.4f} of std'
+
+
+@pytest.mark.parametrize('column', ['friend_cnt', 'shouts', 'subscriber_friend_cnt', 'posts'])
+def test_count_quartiles_are_exact(cubes, column):
+    # Ties in skewed count columns must not blend into fractional quartiles
+    exact, streamed = cubes
+    for key in exact:
+        for name in QUANTILES.values():
+            np.testing.assert_array_equal(streamed[key][column][name].to_numpy(),
+                                          exact[key][column][name].to_numpy())
+
+
+@pytest.mark.parametrize('column', ['friend_cnt', 'songsListened', 'age', 'avg_friend_age'])
+def test_distribution_summary_matches(population, source, cubes, column):
+    exact = summarize_distribution(population, column)
+    streamed = build_streaming_summary(source, column, cubes[1], chunk_rows=CHUNK_ROWS)
+
+    np.testing.assert_allclose(streamed['edges'], exact['edges'])
+    assert streamed['log'] == exact['log']
+    std = population[column].std()
+    for group, expected in exact['groups'].items():
+        got = streamed['groups'][group]
+        np.testing.assert_array_equal(got['counts'], expected['counts'])
+        for stat in ['q1', 'median', 'q3']:
+            assert abs(got['box'][stat] - expected['box'][stat]) / std < QUANTILE_TOLERANCE
+        assert got['box']['count'] == expected['box']['count']
+        np.testing.assert_allclose(got['box']['mean'], expected['box']['mean'])
+        grid = expected['kde']['x']
+        np.testing.assert_allclose(got['kde']['x'], grid, atol=1e-3 * (grid[-1] - grid[0]))
+        np.testing.assert_allclose(got['kde']['density'], expected['kde']['density'],
+                                   atol=1e-2 * expected['kde']['density'].max())
+
+
+def test_digest_is_exact_for_few_distinct_values():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 50, 10000).astype(float)
+    digest = TDigest()
+    for chunk in np.array_split(values, 4):
+        digest.merge(TDigest().update(chunk))
+    assert digest.exact
+    np.testing.assert_allclose(digest.quantile([0.1, 0.25, 0.5, 0.9]), np.quantile(values, [0.1, 0.25, 0.5, 0.9]))
+
+
+def test_digest_stays_bounded():
+    values = np.random.default_rng(1).lognormal(0, 1, 200000)
+    digest = TDigest().update(values)
+    assert not digest.exact and len(digest.means) <= 2 * digest.compression
+    probabilities = [0.01, 0.25, 0.5, 0.75, 0.95]
+    error = np.abs(digest.quantile(probabilities) - np.quantile(values, probabilities))
+    assert (error / values.std() < QUANTILE_TOLERANCE).all()
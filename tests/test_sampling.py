@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from components.aggregates import WEIGHT_COLUMN
+from components.distributions import binned_kde, summarize_distribution
+from components.sampling import group_mean_cis, stratified_mean, stratified_sample
+from components.trajectories import TrajectoryEngine
+
+DICTIONARY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'High Note data dictionary.xlsx')
+
+
+@pytest.fixture(scope='module')
+def population():
+    from tools.synthetic_data import generate_users
+    return generate_users(20000, seed=2)
+
+
+def test_group_cis_match_stratified_mean(population):
+    sample = stratified_sample(population, n_rows=2000)
+    cis = group_mean_cis(sample, 'adopter', ['songsListened', 'posts'])
+
+    for group in (0, 1):
+        rows = sample[sample['adopter'] == group]
+        estimate, half_width = stratified_mean(rows, 'posts')
+        assert cis.loc['posts', group] == half_width > 0
+        # The interval covers the exact mean
+        exact = population.loc[population['adopter'] == group, 'posts'].mean()
+        assert abs(estimate - exact) <= half_width
+
+
+def test_group_cis_are_zero_for_exact_frames(users):
+    cis = group_mean_cis(users, 'adopter', ['posts'])
+    assert np.all(cis.to_numpy() == 0)
+
+
+@pytest.fixture(scope='module')
+def weighted(users):
+    # Integer weights, so the weighted frame stands for its rows repeated
+    sample = users.copy()
+    sample[WEIGHT_COLUMN] = np.random.default_rng(0).integers(1, 4, len(sample)).astype(float)
+    expanded = users.loc[users.index.repeat(sample[WEIGHT_COLUMN].astype(int))]
+    return sample, expanded
+
+
+def test_distribution_shapes_use_weights(weighted):
+    sample, expanded = weighted
+    summary = summarize_distribution(sample, 'songsListened')
+    exact = summarize_distribution(expanded, 'songsListened')
+    for group in (0, 1):
+        box, expected = summary['groups'][group]['box'], exact['groups'][group]['box']
+        assert box['count'] == expected['count']
+        assert box['mean'] == pytest.approx(expected['mean'])
+        assert box['median'] == pytest.approx(expected['median'], rel=0.02)
+
+        rows = sample['adopter'] == group
+        values = sample.loc[rows, 'songsListened'].to_numpy(float)
+        kde = binned_kde(values, bandwidth=50.0, weights=sample.loc[rows, WEIGHT_COLUMN].to_numpy())
+        reference = binned_kde(expanded.loc[expanded['adopter'] == group, 'songsListened'], bandwidth=50.0)
+        assert np.allclose(kde['density'], reference['density'])
+
+
+def test_trajectory_means_use_weights(weighted):
+    sample, expanded = weighted
+    table = TrajectoryEngine.from_frame(sample).table()
+    exact = TrajectoryEngine.from_frame(expanded).table()
+    assert np.allclose(table['mean'], exact['mean'], equal_nan=True)
+    # Intervals stay as wide as the rows actually sampled
+    width = table['ci_high'] - table['mean']
+    assert (table['n'] <= exact['n']).all() and (width.dropna() >= (exact['ci_high'] - exact['mean'])[width.notna()]).all()
+
+
+def _core_metrics_preview(dictionary):
+    import pandas as pd
+    from tools.synthetic_data import generate_users
+    from components.core_metrics import show_core_metrics_tab
+    from components.sampling import stratified_sample
+
+    dict_df = pd.read_excel(dictionary)
+    show_core_metrics_tab(stratified_sample(generate_users(20000, seed=2), n_rows=2000), dict_df)
+
+
+def test_core_metrics_table_shows_intervals_in_preview():
+    at = AppTest.from_function(_core_metrics_preview, args=(DICTIONARY,), default_timeout=120)
+    at.run()
+    assert not at.exception
+    columns = list(at.dataframe[0].value.columns)
+    assert 'Premium Mean ± (95% CI)' in columns and 'Free Mean ± (95% CI)' in columns
+    assert any('preview sample' in caption.value for caption in at.caption)
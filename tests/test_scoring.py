@@ -0,0 +1,124 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from components.compiled_forest import compile_forest, predict_proba
+from components.model_store import FEATURES
+from components.scoring_service import MicroBatcher, make_handler
+
+
+@pytest.fixture(scope='module')
+def compiled(artifact):
+    return compile_forest(artifact)
+
+
+def test_compiled_forest_matches_sklearn(artifact, compiled, users):
+    X = users[FEATURES].to_numpy(dtype=np.float64)
+    expected = artifact['model'].predict_proba(artifact['scaler'].transform(users[FEATURES]))[:, 1]
+    np.testing.assert_allclose(predict_proba(compiled, X), expected, atol=1e-12)
+
+
+@pytest.fixture
+def service(compiled):
+    def start(timeout=5.0, max_wait_ms=20.0):
+        batcher = MicroBatcher(compiled, max_wait_ms=max_wait_ms)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(batcher, timeout=timeout))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}/score'
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _instance(users, i):
+    return {feature: float(users[feature].iloc[i]) for feature in FEATURES}
+
+
+def test_bad_requests_do_not_fail_the_batch(service, compiled, users):
+    url = service()
+    good = {'instances': [_instance(users, i) for i in range(3)]}
+    bad = [{'instances': []}, {'instances': [{'friend_cnt': 1}]}, {'features': 'x'}]
+    with ThreadPoolExecutor(8) as pool:
+        good_results = [pool.submit(_post, url, good) for _ in range(5)]
+        bad_results = [pool.submit(_post, url, payload) for payload in bad]
+
+    expected = predict_proba(compiled, [[row[f] for f in FEATURES] for row in good['instances']])
+    for result in good_results:
+        status, body = result.result()
+        assert status == 200
+        np.testing.assert_allclose(body['probabilities'], expected)
+    assert [result.result()[0] for result in bad_results] == [400, 400, 400]
+
+
+def test_timeout_returns_503(service, users):
+    url = service(timeout=0.01, max_wait_ms=500.0)
+    status, body = _post(url, {'features': _instance(users, 0)})
+    assert status == 503
+
+
+def test_submit_rejects_wrong_width(compiled):
+    batcher = MicroBatcher(compiled)
+    with pytest.raises(ValueError):
+        batcher.submit([[1.0, 2.0]])
+    with pytest.raises(ValueError):
+        batcher.submit(np.empty((0, len(FEATURES))))
+
+
+def test_failing_request_is_isolated(compiled):
+    batcher = MicroBatcher(compiled, max_wait_ms=50.0)
+    good = batcher.submit(np.ones((2, len(FEATURES))))
+    # Bypasses submit's checks, as a request the batch cannot stack with
+    broken = Future()
+    batcher.requests.put((np.ones((1, 2)), broken))
+
+    assert len(good.result(timeout=5)) == 2
+    with pytest.raises(Exception):
+        broken.result(timeout=5)
+
+
+def test_export_defaults_to_the_tabs_model(artifact, users, tmp_path, monkeypatch):
+    import components.data_loader as data_loader
+    import components.model_store as model_store
+    from sklearn.linear_model import LogisticRegression
+    from components.compiled_forest import load_compiled, main
+
+    selected = dict(artifact, model=LogisticRegression(), model_name='logistic_regression')
+    trained = []
+
+    def load_or_train(df, params=model_store.DEFAULT_PARAMS):
+        trained.append(params['candidates'])
+        return selected if params is model_store.DEFAULT_PARAMS else artifact
+
+    monkeypatch.setattr(data_loader, 'load_dataset', lambda: (users, None))
+    monkeypatch.setattr(model_store, 'load_or_train', load_or_train)
+    output = str(tmp_path / 'forest.npz')
+
+    # The tab's model is not a forest: refuse rather than export another model
+    with pytest.raises(SystemExit):
+        main(['-o', output])
+    assert trained == [model_store.DEFAULT_PARAMS['candidates']]
+
+    main(['-o', output, '--train-forest'])
+    assert trained[-1] == ['random_forest']
+    assert len(load_compiled(output)['roots']) == len(artifact['model'].estimators_)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from components.trajectories import TrajectoryEngine
+
+
+def _usage_tab(adopter):
+    from tools.synthetic_data import generate_users
+    from components.usage_patterns import show_usage_patterns_tab
+
+    users = generate_users(3000, seed=1)
+    show_usage_patterns_tab(users[users['adopter'] == adopter].reset_index(drop=True))
+
+
+@pytest.mark.parametrize('adopter', [0, 1])
+def test_tab_renders_segment_with_one_group(adopter):
+    at = AppTest.from_function(_usage_tab, args=(adopter,), default_timeout=120)
+    at.run()
+    assert not at.exception
+    assert len(at.dataframe) == 1
+
+
+def test_missing_group_is_nan(users):
+    engine = TrajectoryEngine.from_frame(users[users['adopter'] == 0])
+
+    trajectory = engine.trajectory('songsListened')
+    assert list(trajectory.index) == engine.periods
+    assert trajectory['mean'][1].isna().all()
+    assert trajectory['mean'][0].notna().all()
+
+    lift = engine.lift('songsListened')
+    assert lift['lift'].isna().all()
+
+
+def test_trajectory_matches_pandas(users):
+    engine = TrajectoryEngine.from_frame(users)
+    trajectory = engine.trajectory('lovedTracks', 'male', 1)
+    expected = users[users['male'] == 1].groupby('adopter')['delta2_lovedTracks'].mean()
+    np.testing.assert_allclose(trajectory.loc['Post', 'mean'].to_numpy(), expected.to_numpy())
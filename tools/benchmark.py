@@ -0,0 +1,342 @@
+import argparse
+import datetime
+import functools
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+# Times the dashboard's hot paths on synthetic data (see tools/synthetic_data.py)
+# at increasing sizes and appends the results to a JSON history, so a slowdown
+# shows up as a jump between commits. Streamlit is replaced by a stub, so the
+# numbers are the Python work behind each tab, without a browser or a server.
+#   python -m tools.benchmark --rows 10000 100000 1000000
+#
+# Each path is timed cold (first call in a fresh process: in-memory caches
+# empty, on-disk caches from earlier steps kept) and warm (best of --repeats
+# calls with the caches filled).
+#
+# The default history (benchmarks/history.json) is local to the checkout and
+# not tracked, since timings only compare on the same machine; point
+# --history at a persistent file (e.g. a CI cache) to compare across runs.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'history.json')
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+# Warm time over the previous run's (same row count) that counts as a regression
+REGRESSION_RATIO = 1.25
+
+
+class _Element:
+    # Whatever Streamlit returns that is not a widget value: containers,
+    # columns, placeholders, charts. Every call and attribute is a no-op.
+
+    def __call__(self, *args, **kwargs):
+        return _Element()
+
+    def __getattr__(self, name):
+        return _Element()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _SessionState(dict):
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _Cache:
+    # Memoizes like st.cache_data / st.cache_resource: keyed on the arguments
+    # whose names do not start with an underscore
+
+    def __init__(self, func):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.signature = inspect.signature(func)
+        self.entries = {}
+
+    def __call__(self, *args, **kwargs):
+        bound = self.signature.bind(*args, **kwargs)
+        key = repr([(name, value) for name, value in bound.arguments.items() if not name.startswith('_')])
+        if key not in self.entries:
+            self.entries[key] = self.func(*args, **kwargs)
+        return self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+class StreamlitStub(types.ModuleType):
+    # Enough of the Streamlit API for the components to run outside a server:
+    # widgets return their default value, layout calls return no-op elements
+
+    def __init__(self, name='streamlit'):
+        super().__init__(name)
+        self.caches = []
+        self.session_state = _SessionState()
+        if name == 'streamlit':
+            self.sidebar = StreamlitStub('streamlit.sidebar')
+
+    def __getattr__(self, name):
+        return _Element()
+
+    def _cache(self, func=None, **kwargs):
+        if func is None:
+            return self._cache
+        cache = _Cache(func)
+        self.caches.append(cache)
+        return cache
+
+    cache_data = cache_resource = _cache
+
+    def clear_caches(self):
+        for cache in self.caches:
+            cache.clear()
+        self.session_state.clear()
+
+    def fragment(self, func=None, **kwargs):
+        return func if func is not None else (lambda func: func)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return options[index] if options and index is not None else None
+
+    radio = selectbox
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return list(default or [])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return value if value is not None else min_value
+
+    def number_input(self, label, min_value=None, max_value=None, value='min', **kwargs):
+        if value == 'min':
+            return min_value if min_value is not None else 0.0
+        return value
+
+    def checkbox(self, label, value=False, **kwargs):
+        return value
+
+    toggle = checkbox
+
+    def text_input(self, label, value='', **kwargs):
+        return value
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def chat_input(self, *args, **kwargs):
+        return None
+
+    def columns(self, spec, **kwargs):
+        return [_Element() for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels):
+        return [_Element() for _ in labels]
+
+    def write_stream(self, stream):
+        return ''.join(chunk for chunk in stream if isinstance(chunk, str))
+
+
+def install_streamlit_stub():
+    # Must run before any component is imported: they bind `st` at import time
+    if any(name.startswith('components.') for name in sys.modules):
+        raise RuntimeError("Install the Streamlit stub before importing components")
+    stub = StreamlitStub()
+    sys.modules['streamlit'] = stub
+    return stub
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _measure(stub, func, repeats):
+    stub.clear_caches()
+    cold, result = _timed(func)
+    warm = min(_timed(func)[0] for _ in range(repeats)) if repeats else None
+    return {'cold': round(cold, 4), 'warm': None if warm is None else round(warm, 4)}, result
+
+
+def run_benchmarks(stub, n_rows, work_dir, repeats=3, seed=0, only=None):
+    from components.batch_scoring import score_frame
+    from components.chat_analysis import show_chat_analysis_tab
+    from components.chat_context import get_numeric_data_context
+    from components.core_metrics import show_core_metrics_tab
+    from components.data_loader import DICTIONARY_PATH, data_fingerprint, load_dataset
+    from components.geography import show_geography_tab
+    from components.model_store import DEFAULT_PARAMS, FEATURES, model_key, save_artifact, train_artifact
+    from components.prediction import show_prediction_tab
+    from components.premium_vs_free import show_premium_vs_free_tab
+    from components.usage_patterns import show_usage_patterns_tab
+    from tools.synthetic_data import write_users
+
+    source = write_users(os.path.join(work_dir, f'users_{n_rows}.parquet'), n_rows, seed)
+    dict_path = os.path.join(REPO_ROOT, DICTIONARY_PATH)
+    cache_dir = os.path.join(work_dir, f'cache_{n_rows}')
+
+    def report(name, timing):
+        print(f"  {name:<28} {timing['cold']:.3f}s")
+        return timing
+
+    # load_data always runs first, as every other path needs its frame; the
+    # cold time includes building the Arrow cache from the source file
+    results = {}
+    timing, (df, dict_df) = _measure(stub, lambda: load_dataset(source, dict_path, cache_dir), repeats)
+    results['load_data'] = report('load_data', timing)
+
+    # Training runs once (no warm time). The model is stored so the prediction
+    # tab loads it instead of training again
+    timing, artifact = _measure(stub, lambda: train_artifact(df), 0)
+    save_artifact(model_key(data_fingerprint(df), FEATURES, DEFAULT_PARAMS), artifact)
+    if not only or 'train_model' in only:
+        results['train_model'] = report('train_model', timing)
+
+    paths = {
+        'batch_predict': lambda: score_frame(df, artifact),
+        'get_numeric_data_context': lambda: get_numeric_data_context(df),
+        'show_premium_vs_free_tab': lambda: show_premium_vs_free_tab(df),
+        'show_geography_tab': lambda: show_geography_tab(df),
+        'show_usage_patterns_tab': lambda: show_usage_patterns_tab(df),
+        'show_core_metrics_tab': lambda: show_core_metrics_tab(df, dict_df),
+        'show_prediction_tab': lambda: show_prediction_tab(df),
+        'show_chat_analysis_tab': lambda: show_chat_analysis_tab(df, dict_df, None),
+    }
+    for name, func in paths.items():
+        if not only or name in only:
+            results[name] = report(name, _measure(stub, func, repeats)[0])
+    return results
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(dirty)
+
+
+def read_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_history(records, path=HISTORY_PATH):
+    history = read_history(path) + records
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+    return history
+
+
+def previous_run(history, rows):
+    # Latest recorded run at the same size
+    for previous in reversed(history):
+        if previous['rows'] == rows:
+            return previous
+    return None
+
+
+def regressions(record, previous, ratio=REGRESSION_RATIO):
+    if previous is None:
+        return {}
+    # Warm times are the steadier signal; paths without one compare cold
+    slower = {}
+    for name, timing in record['results'].items():
+        kind = 'warm' if timing['warm'] is not None else 'cold'
+        before = previous['results'].get(name, {}).get(kind)
+        if before and timing[kind] > before * ratio:
+            slower[name] = (kind, before, timing[kind])
+    return slower
+
+
+def format_report(record, previous, slower):
+    lines = [f"{record['rows']:,} rows"
+             + (f" (vs {previous['commit']} at {previous['timestamp']})" if previous else "")]
+    for name, timing in record['results'].items():
+        before = previous['results'].get(name, {}) if previous else {}
+        warm = f"{timing['warm']:.4f}s" if timing['warm'] is not None else '-'
+        line = f"  {name:<28} cold {timing['cold']:>9.4f}s  warm {warm:>10}"
+        if before:
+            line += f"  (was {before.get('cold', 0):.4f}s / {before.get('warm') or 0:.4f}s)"
+        if name in slower:
+            line += f"  REGRESSION: {slower[name][0]} {slower[name][2] / slower[name][1]:.2f}x"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's hot paths on synthetic data.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help="Paths to report besides load_data (default: all)")
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--work-dir', help="Where data and caches go (default: a temporary directory)")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='highnote-bench-')
+    os.makedirs(work_dir, exist_ok=True)
+    # Caches (models, chat context, responses) go to the work dir, not the repo
+    os.environ['HIGHNOTE_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    os.environ.pop('HIGHNOTE_MODEL_DIR', None)
+    stub = install_streamlit_stub()
+    sys.path.insert(0, REPO_ROOT)
+
+    commit, dirty = _git_commit()
+    records = []
+    for n_rows in args.rows:
+        print(f"Benchmarking {n_rows:,} rows")
+        records.append({
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'dirty': dirty,
+            'rows': n_rows,
+            'seed': args.seed,
+            'repeats': args.repeats,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': run_benchmarks(stub, n_rows, work_dir, args.repeats, args.seed, args.only),
+        })
+
+    earlier = read_history(args.history)
+    append_history(records, args.history)
+    any_regression = False
+    for record in records:
+        previous = previous_run(earlier, record['rows'])
+        slower = regressions(record, previous)
+        any_regression = any_regression or bool(slower)
+        print(format_report(record, previous, slower))
+    print(f"History: {args.history}")
+    if args.fail_on_regression and any_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
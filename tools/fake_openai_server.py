@@ -0,0 +1,133 @@
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal stand-in for the OpenAI chat completions endpoint, for trying the chat
+# tab offline. Point the app at it with:
+#   OPENAI_BASE_URL=http://127.0.0.1:8600/v1 OPENAI_API_KEY=test streamlit run app.py
+
+
+# Tool call issued on the first round when the request offers tools
+CANNED_TOOL_CALL = {'name': 'group_aggregates',
+                    'arguments': json.dumps({'by': 'adopter', 'columns': ['songsListened', 'friend_cnt']})}
+
+
+def canned_answer(request):
+    prompt = next(m.get('content') or '' for m in reversed(request['messages']) if m['role'] == 'user')
+    system = request['messages'][0].get('content') or ''
+    tool_results = [m.get('content') or '' for m in request['messages'] if m['role'] == 'tool']
+    return (f"Stand-in answer for: {prompt}\n\n"
+            f"- System prompt size: {len(system):,} characters\n"
+            f"- Tool results: {len(tool_results)} ({sum(map(len, tool_results)):,} characters)\n"
+            f"- Model: {request.get('model')}, temperature: {request.get('temperature')}")
+
+
+def wants_tool_call(request):
+    return (bool(request.get('tools')) and request.get('tool_choice') != 'none'
+            and not any(m['role'] == 'tool' for m in request['messages']))
+
+
+def make_handler(token_delay):
+
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        requests_served = 0
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, completion_id, model, answer=None, tool_call=None):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            if tool_call is not None:
+                # Split like the real API: id and name first, then argument fragments
+                arguments = tool_call['arguments']
+                deltas = [{'tool_calls': [{'index': 0, 'id': f"call_{uuid.uuid4().hex[:12]}", 'type': 'function',
+                                           'function': {'name': tool_call['name'], 'arguments': ''}}]}]
+                deltas += [{'tool_calls': [{'index': 0, 'function': {'arguments': arguments[i:i + 16]}}]}
+                           for i in range(0, len(arguments), 16)]
+            else:
+                deltas = [{'content': word + ' '} for word in answer.split(' ')]
+            for delta in deltas:
+                chunk = {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(token_delay)
+            done = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {},
+                             'finish_reason': 'tool_calls' if tool_call is not None else 'stop'}],
+            }
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+            self.wfile.flush()
+            self.close_connection = True
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._json(404, {'error': {'message': 'not found'}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            type(self).requests_served += 1
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = request.get('model', 'stand-in')
+            if request.get('stream'):
+                if wants_tool_call(request):
+                    self._stream(completion_id, model, tool_call=CANNED_TOOL_CALL)
+                else:
+                    self._stream(completion_id, model, answer=canned_answer(request))
+                return
+
+            if wants_tool_call(request):
+                message = {'role': 'assistant', 'content': None, 'tool_calls': [
+                    {'id': f"call_{uuid.uuid4().hex[:12]}", 'type': 'function', 'function': CANNED_TOOL_CALL}]}
+                finish_reason = 'tool_calls'
+            else:
+                message = {'role': 'assistant', 'content': canned_answer(request)}
+                finish_reason = 'stop'
+            self._json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOpenAIHandler
+
+
+def serve(host='127.0.0.1', port=8600, token_delay=0.0):
+    server = ThreadingHTTPServer((host, port), make_handler(token_delay))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--token-delay', type=float, default=0.02, help="Seconds between streamed words")
+    args = parser.parse_args(argv)
+
+    server = serve(args.host, args.port, args.token_delay)
+    print(f"Stand-in OpenAI API on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
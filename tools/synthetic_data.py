@@ -0,0 +1,169 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Synthetic users with the High Note schema, for benchmarking at sizes the
+# original workbook does not reach. Distributions follow the real table: heavy
+# (log-normal) tails for songsListened, friend_cnt, lovedTracks and shouts, an
+# adopter rate of about 8%, and pre/post period deltas driven by the same
+# per-user activity level, with adopters more active after converting.
+#   python -m tools.synthetic_data 1000000 users.parquet
+
+BASE_METRICS = ['friend_cnt', 'avg_friend_age', 'avg_friend_male', 'friend_country_cnt',
+                'subscriber_friend_cnt', 'songsListened', 'lovedTracks', 'posts', 'playlists', 'shouts']
+
+COLUMNS = (['net_user', 'age', 'male', *BASE_METRICS]
+           + [f'delta1_{metric}' for metric in BASE_METRICS]
+           + ['adopter', 'tenure', 'good_country', 'delta1_good_country']
+           + [f'delta2_{metric}' for metric in BASE_METRICS]
+           + ['delta2_good_country'])
+
+ADOPTER_RATE = 0.08
+# Extra post-period activity of adopters, so trajectories show a lift
+ADOPTER_LIFT = 0.3
+# Share of users moving into or out of the US, UK or Germany per period
+MOVE_RATE = 0.005
+
+CHUNK_ROWS = 250_000
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def _counts(values):
+    return np.maximum(np.floor(values), 0).astype(np.int64)
+
+
+def _intercept(scores, rate, iterations=40):
+    # Logistic intercept that makes the expected adopter share equal `rate`
+    low, high = -20.0, 20.0
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        if (1 / (1 + np.exp(-(mid + scores)))).mean() < rate:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def _period_deltas(rng, users, activity):
+    # New activity in one period, scaled by the user's activity level
+    friend_cnt = users['friend_cnt']
+    gained = rng.poisson(0.15 * friend_cnt * activity + 0.5)
+    lost = rng.poisson(0.03 * friend_cnt + 0.1)
+    new_friends = np.maximum(gained - lost, 0)
+    has_new = new_friends > 0
+    return {
+        'friend_cnt': gained - lost,
+        'avg_friend_age': np.where(has_new, rng.normal(0, 1.5, len(activity)), 0.0),
+        'avg_friend_male': np.where(has_new, rng.normal(0, 0.2, len(activity)), 0.0),
+        'friend_country_cnt': rng.binomial(new_friends, 0.2),
+        'subscriber_friend_cnt': rng.binomial(new_friends, 0.05),
+        'songsListened': _counts(users['songsListened'] * rng.gamma(2.0, 0.05 * activity)),
+        'lovedTracks': rng.poisson(0.08 * users['lovedTracks'] * activity + 0.3),
+        'posts': rng.poisson(0.1 * activity),
+        'playlists': rng.poisson(0.05 * activity),
+        'shouts': rng.poisson(0.15 * users['shouts'] * activity + 0.2),
+    }
+
+
+def _moves(rng, good_country):
+    moved = rng.random(len(good_country)) < MOVE_RATE
+    return np.where(moved, np.where(good_country == 1, -1, 1), 0)
+
+
+def users_chunk(n_rows, seed=0, start=0, adopter_rate=ADOPTER_RATE):
+    # One block of users; seeded by (seed, start) so any block can be
+    # regenerated on its own
+    rng = np.random.default_rng([seed, start])
+    latent = rng.normal(0, 1, n_rows)
+
+    users = {
+        'net_user': np.char.add('user_', np.arange(start, start + n_rows).astype(str)).astype(object),
+        'age': _counts(np.clip(rng.normal(25, 7, n_rows), 8, 79)),
+        'male': (rng.random(n_rows) < 0.62).astype(np.int64),
+        'friend_cnt': _counts(rng.lognormal(1.9 + 0.4 * latent, 1.1) - 1),
+    }
+    friend_cnt = users['friend_cnt']
+    has_friends = friend_cnt > 0
+    users['avg_friend_age'] = np.where(has_friends, np.clip(rng.normal(users['age'] - 1, 4), 8, 79), np.nan)
+    users['avg_friend_male'] = np.where(has_friends, rng.beta(3, 2, n_rows), np.nan)
+    users['friend_country_cnt'] = np.minimum(friend_cnt, rng.poisson(1 + 0.3 * np.sqrt(friend_cnt)))
+    users['subscriber_friend_cnt'] = rng.binomial(friend_cnt, 0.04)
+    users['songsListened'] = _counts(rng.lognormal(9.2 + 0.5 * latent, 1.3))
+    users['lovedTracks'] = _counts(rng.lognormal(3.0 + 0.5 * latent, 1.6) - 1)
+    users['posts'] = rng.poisson(0.3 * np.exp(0.5 * latent))
+    users['playlists'] = rng.poisson(0.6 * np.exp(0.3 * latent))
+    users['shouts'] = _counts(rng.lognormal(1.2 + 0.5 * latent, 1.5) - 1)
+
+    activity = np.exp(0.5 * latent)
+    delta1 = _period_deltas(rng, users, activity)
+
+    good_country = (rng.random(n_rows) < 0.36).astype(np.int64)
+    scores = 0.6 * latent + 0.5 * np.log1p(users['subscriber_friend_cnt']) + 0.3 * good_country
+    adopter = (rng.random(n_rows) < 1 / (1 + np.exp(-(_intercept(scores, adopter_rate) + scores))))
+
+    delta2 = _period_deltas(rng, users, activity * (1 + ADOPTER_LIFT * adopter))
+
+    users.update({f'delta1_{metric}': values for metric, values in delta1.items()})
+    users['adopter'] = adopter.astype(np.int64)
+    users['tenure'] = _counts(np.clip(rng.gamma(2.0, 22.0, n_rows), 1, 111))
+    users['good_country'] = good_country
+    users['delta1_good_country'] = _moves(rng, good_country)
+    users.update({f'delta2_{metric}': values for metric, values in delta2.items()})
+    users['delta2_good_country'] = _moves(rng, good_country)
+    return pd.DataFrame(users, columns=COLUMNS)
+
+
+def iter_users(n_rows, seed=0, adopter_rate=ADOPTER_RATE, chunk_rows=CHUNK_ROWS):
+    for start in range(0, n_rows, chunk_rows):
+        yield users_chunk(min(chunk_rows, n_rows - start), seed, start, adopter_rate)
+
+
+def generate_users(n_rows, seed=0, adopter_rate=ADOPTER_RATE):
+    return pd.concat(iter_users(n_rows, seed, adopter_rate), ignore_index=True)
+
+
+def write_users(path, n_rows, seed=0, adopter_rate=ADOPTER_RATE):
+    # Parquet and CSV are written block by block, so memory stays bounded at
+    # any size; Excel needs the whole table and is capped at a million rows
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xlsx':
+        if n_rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel holds at most {EXCEL_MAX_ROWS:,} rows; use .parquet or .csv")
+        generate_users(n_rows, seed, adopter_rate).to_excel(path, index=False)
+    elif extension == '.parquet':
+        writer = None
+        try:
+            for chunk in iter_users(n_rows, seed, adopter_rate):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif extension == '.csv':
+        for index, chunk in enumerate(iter_users(n_rows, seed, adopter_rate)):
+            chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {path}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic users with the High Note schema.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output', help="Parquet, CSV or Excel file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--adopter-rate', type=float, default=ADOPTER_RATE)
+    args = parser.parse_args(argv)
+
+    write_users(args.output, args.rows, args.seed, args.adopter_rate)
+    print(f"Wrote {args.rows:,} synthetic users to {args.output}")
+
+
+if __name__ == '__main__':
+    main()